@@ -0,0 +1,121 @@
+"""Prompt tokens and latency with and without context packing.
+
+The fixture corpus is the repository's README files plus
+``static/knowledge_base.json``. Each document is split like the chatbot does
+(1500/200) and a "retrieval" returns ``-k`` adjacent chunks plus copies of
+two of them from a re-uploaded duplicate, which is what overlapping chunks
+and repeat uploads look like in ``generate``.
+
+With ``--live`` each prompt is also sent to the model configured in ``.env``
+and time to first token / total latency are compared.
+
+Run:
+> python bench_context_packing.py -k 5 --budget 4000 --live
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import time
+
+from context_packing import count_tokens, pack_context
+from langchain_core.documents import Document
+from utils import RecursiveTextSplitter
+
+REPO = pathlib.Path(__file__).parents[4]
+KNOWLEDGE_BASE = REPO / "chapter04" / "static" / "knowledge_base.json"
+
+
+def fixture() -> list[Document]:
+    docs = [
+        Document(
+            page_content=path.read_text(encoding="utf-8"),
+            metadata={"source": str(path)},
+        )
+        for path in sorted(REPO.glob("**/README.md"))
+    ]
+    entries = json.loads(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+    docs.append(
+        Document(
+            page_content="\n\n".join(e["content"] for e in entries),
+            metadata={"source": str(KNOWLEDGE_BASE)},
+        )
+    )
+    return docs
+
+
+def retrieve(doc: Document, k: int) -> list[Document]:
+    splitter = RecursiveTextSplitter(
+        chunk_size=1500, chunk_overlap=200, add_start_index=True
+    )
+    chunks = splitter.split_documents([doc])
+    copies = [
+        Document(
+            page_content=c.page_content,
+            metadata={**c.metadata, "source": "copy of " + c.metadata["source"]},
+        )
+        for c in chunks[:2]
+    ]
+    return chunks[:k] + copies
+
+
+def latency(model, context: str, question: str, repeat: int) -> tuple[float, float]:
+    """Median time to first token and total seconds over ``repeat`` calls."""
+    prompt = [
+        ("system", f"Answer from these documents:\n\n{context}"),
+        ("human", question),
+    ]
+    firsts, totals = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        first = None
+        for _ in model.stream(prompt):
+            if first is None:
+                first = time.perf_counter() - started
+        firsts.append(first or 0.0)
+        totals.append(time.perf_counter() - started)
+    return statistics.median(firsts), statistics.median(totals)
+
+
+def main(args: argparse.Namespace) -> None:
+    before = after = 0
+    pack_seconds = 0.0
+    baseline_texts, packed_texts = [], []
+    for doc in fixture():
+        retrieved = retrieve(doc, args.k)
+        started = time.perf_counter()
+        packed, report = pack_context(retrieved, args.budget)
+        pack_seconds += time.perf_counter() - started
+        print(f"{pathlib.Path(doc.metadata['source']).parent.name or '.'}: {report}")
+        baseline = "\n\n".join(d.page_content for d in retrieved)
+        context = "\n\n".join(d.page_content for d in packed)
+        before += count_tokens(baseline)
+        after += count_tokens(context)
+        baseline_texts.append(baseline)
+        packed_texts.append(context)
+    print(
+        f"total prompt context: {before} -> {after} tokens "
+        f"({1 - after / before:.0%} saved), packing {pack_seconds * 1000:.1f} ms"
+    )
+
+    if args.live:
+        from config import Config
+
+        model = Config().new_openai_like(temperature=0, max_tokens=args.max_tokens)
+        question = "Summarize these documents in one sentence."
+        for name, texts in (("unpacked", baseline_texts), ("packed", packed_texts)):
+            results = [latency(model, t, question, args.repeat) for t in texts]
+            ttft = statistics.mean(r[0] for r in results)
+            total = statistics.mean(r[1] for r in results)
+            print(f"{name:<9} ttft {ttft * 1000:.0f} ms, total {total * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-k", type=int, default=5, help="adjacent chunks retrieved")
+    parser.add_argument("--budget", type=int, default=4000, help="max context tokens")
+    parser.add_argument("--live", action="store_true", help="also time the LLM")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    main(parser.parse_args())
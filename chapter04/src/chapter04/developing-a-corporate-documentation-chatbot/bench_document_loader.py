@@ -0,0 +1,270 @@
+"""Parsing throughput: serial load_document vs DocumentLoaderService.
+
+For each file, reports MB/s, pages/s and time to first page for a plain
+``load_document`` call and for ``DocumentLoaderService.stream``, then parses
+all files at once through the service to show the process-pool speedup.
+Without ``--files``, a TXT, PDF, EPUB and DOCX file with the same text,
+``static/knowledge_base.json`` repeated ``--repeat`` times, are generated.
+Formats whose parser isn't installed are skipped.
+
+Run:
+> python bench_document_loader.py --files manual.pdf book.epub report.docx
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import tempfile
+import textwrap
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from document_loader import DocumentLoaderService, lazy_load_document, load_document
+
+KNOWLEDGE_BASE = pathlib.Path(__file__).parents[3] / "static" / "knowledge_base.json"
+# Sample chapters (EPUB) and paragraphs per page (PDF)
+PARAGRAPHS_PER_CHAPTER = 50
+LINES_PER_PAGE = 60
+
+
+def sample_paragraphs(repeat: int) -> list[str]:
+    entries = json.loads(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+    return [e["content"] for e in entries] * repeat
+
+
+def write_txt(path: str, paragraphs: list[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+
+
+def write_pdf(path: str, paragraphs: list[str]) -> None:
+    """A plain-text PDF in Helvetica, ``LINES_PER_PAGE`` lines a page."""
+    lines = []
+    for paragraph in paragraphs:
+        lines += textwrap.wrap(paragraph, 95) + [""]
+    pages = [
+        lines[i : i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)
+    ]
+
+    def text(s: str) -> str:
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    # 1: catalog, 2: page tree, 3: font, then a page and its content per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in pages:
+        stream = "BT /F1 9 Tf 12 TL 40 800 Td " + " ".join(
+            f"({text(line)}) '" for line in page
+        )
+        stream += " ET"
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects) + 2} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode()
+        )
+    kids_list = " ".join(kids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids_list}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: list[str]) -> None:
+    """A minimal WordprocessingML package with one paragraph per entry."""
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            "</Types>",
+        )
+        z.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'relationships"><Relationship Id="rId1" Type="http://schemas.'
+            "openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+            '" Target="word/document.xml"/></Relationships>',
+        )
+        z.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            f'wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>',
+        )
+
+
+def write_epub(path: str, paragraphs: list[str]) -> None:
+    """A minimal EPUB 2 book, ``PARAGRAPHS_PER_CHAPTER`` paragraphs a chapter."""
+    chapters = [
+        paragraphs[i : i + PARAGRAPHS_PER_CHAPTER]
+        for i in range(0, len(paragraphs), PARAGRAPHS_PER_CHAPTER)
+    ]
+    names = [f"chapter{i}.xhtml" for i in range(len(chapters))]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        # The mimetype entry must come first, uncompressed.
+        z.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        z.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0"?><container version="1.0" '
+            'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="content.opf" '
+            'media-type="application/oebps-package+xml"/></rootfiles></container>',
+        )
+        manifest = "".join(
+            f'<item id="c{i}" href="{name}" media-type="application/xhtml+xml"/>'
+            for i, name in enumerate(names)
+        )
+        spine = "".join(f'<itemref idref="c{i}"/>' for i in range(len(names)))
+        z.writestr(
+            "content.opf",
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" '
+            'version="2.0" unique-identifier="id"><metadata '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            "<dc:title>Knowledge base</dc:title><dc:language>en</dc:language>"
+            '<dc:identifier id="id">knowledge-base</dc:identifier></metadata>'
+            f'<manifest>{manifest}<item id="ncx" href="toc.ncx" '
+            'media-type="application/x-dtbncx+xml"/></manifest>'
+            f'<spine toc="ncx">{spine}</spine></package>',
+        )
+        points = "".join(
+            f'<navPoint id="n{i}" playOrder="{i + 1}"><navLabel><text>Chapter {i + 1}'
+            f'</text></navLabel><content src="{name}"/></navPoint>'
+            for i, name in enumerate(names)
+        )
+        z.writestr(
+            "toc.ncx",
+            '<?xml version="1.0"?><ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" '
+            'version="2005-1"><head><meta name="dtb:uid" content="knowledge-base"/>'
+            "</head><docTitle><text>Knowledge base</text></docTitle>"
+            f"<navMap>{points}</navMap></ncx>",
+        )
+        for i, (name, chapter) in enumerate(zip(names, chapters)):
+            body = "".join(f"<p>{escape(p)}</p>" for p in chapter)
+            z.writestr(
+                name,
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+                f"<title>Chapter {i + 1}</title></head><body>"
+                f"<h1>Chapter {i + 1}</h1>{body}</body></html>",
+            )
+
+
+SAMPLE_WRITERS = {
+    ".txt": write_txt,
+    ".pdf": write_pdf,
+    ".epub": write_epub,
+    ".docx": write_docx,
+}
+
+
+def sample_files(directory: str, repeat: int) -> list[str]:
+    """The knowledge base in every supported format."""
+    paragraphs = sample_paragraphs(repeat)
+    files = []
+    for ext, write in SAMPLE_WRITERS.items():
+        path = os.path.join(directory, f"knowledge_base{ext}")
+        write(path, paragraphs)
+        files.append(path)
+    return files
+
+
+def measure(load) -> dict:
+    """Drain the pages ``load()`` returns, timing the first one and the whole run."""
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for _ in load():
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    return {"seconds": time.perf_counter() - started, "first": first or 0.0, "pages": count}
+
+
+def row(label: str, path: str, result: dict) -> str:
+    megabytes = os.path.getsize(path) / 1e6
+    seconds = result["seconds"] or 1e-9
+    return (
+        f"{label:<8} {pathlib.Path(path).suffix:<6} {result['pages']:>6} "
+        f"{megabytes / seconds:>8.2f} {result['pages'] / seconds:>9.1f} "
+        f"{result['first'] * 1000:>10.1f}"
+    )
+
+
+def parseable(path: str) -> bool:
+    """Whether this environment has the parser for ``path``."""
+    try:
+        next(lazy_load_document(path), None)
+    except ImportError as e:
+        print(f"skipping {pathlib.Path(path).suffix}: {e}")
+        return False
+    return True
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        files = args.files or sample_files(directory, args.repeat)
+        files = [path for path in files if parseable(path)]
+        service = DocumentLoaderService(max_workers=args.workers)
+        # Start the pool outside the timings, as the app does on first upload.
+        measure(lambda: service.stream(files[0]))
+
+        print(f"{'mode':<8} {'ext':<6} {'pages':>6} {'MB/s':>8} {'pages/s':>9} {'first ms':>10}")
+        for path in files:
+            print(row("serial", path, measure(lambda: load_document(path))))
+            print(row("service", path, measure(lambda: service.stream(path))))
+
+        # Every file at once: serial parsing vs one stream per file.
+        started = time.perf_counter()
+        for path in files:
+            load_document(path)
+        serial = time.perf_counter() - started
+        started = time.perf_counter()
+        with ThreadPoolExecutor(len(files)) as pool:
+            list(pool.map(lambda p: measure(lambda: service.stream(p)), files))
+        parallel = time.perf_counter() - started
+        print(
+            f"all {len(files)} files: serial {serial:.2f}s, "
+            f"service {parallel:.2f}s ({serial / parallel:.1f}x)"
+        )
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", nargs="*", default=[])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--repeat", type=int, default=2000, help="copies of the sample text"
+    )
+    main(parser.parse_args())
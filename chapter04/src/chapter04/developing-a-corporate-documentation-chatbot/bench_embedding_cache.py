@@ -0,0 +1,86 @@
+"""Embedding cache throughput: LocalFileStore vs SQLiteByteStore.
+
+Embeds the same chunks twice through ``CacheBackedEmbeddings`` backed by each
+store: the cold pass misses and writes every vector, the warm pass only
+reads. Uses random vectors so no embedding model is needed.
+
+Run:
+> python bench_embedding_cache.py --chunks 20000 --dim 384
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from embedding_cache import SQLiteByteStore, cache_backed_embeddings
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
+from langchain_core.embeddings import Embeddings
+
+
+class RandomEmbeddings(Embeddings):
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rng = np.random.default_rng(0)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.rng.standard_normal((len(texts), self.dim)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def disk_usage(path: str) -> tuple[int, int]:
+    """Total bytes and number of files under ``path``."""
+    total = files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            total += os.path.getsize(os.path.join(root, name))
+            files += 1
+    return total, files
+
+
+def run(embeddings: CacheBackedEmbeddings, texts: list[str], batch: int) -> tuple:
+    timings = []
+    for _ in ("cold", "warm"):
+        started = time.perf_counter()
+        for start in range(0, len(texts), batch):
+            embeddings.embed_documents(texts[start : start + batch])
+        timings.append(len(texts) / (time.perf_counter() - started))
+    return tuple(timings)
+
+
+def main(args: argparse.Namespace) -> None:
+    texts = [f"chunk {i} " * 20 for i in range(args.chunks)]
+    print(f"{'store':<10} {'cold/s':>9} {'warm/s':>9} {'MB':>7} {'files':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        local_dir = os.path.join(directory, "local")
+        local = CacheBackedEmbeddings.from_bytes_store(
+            RandomEmbeddings(args.dim),
+            LocalFileStore(local_dir),
+            namespace="bench",
+            key_encoder="sha256",
+        )
+        sqlite_dir = os.path.join(directory, "sqlite")
+        os.makedirs(sqlite_dir)
+        store = SQLiteByteStore(os.path.join(sqlite_dir, "cache.sqlite"))
+        sqlite = cache_backed_embeddings(RandomEmbeddings(args.dim), store, "bench")
+
+        for name, embeddings, path in (
+            ("local", local, local_dir),
+            ("sqlite", sqlite, sqlite_dir),
+        ):
+            cold, warm = run(embeddings, texts, args.batch)
+            size, files = disk_usage(path)
+            print(f"{name:<10} {cold:>9.0f} {warm:>9.0f} {size / 1e6:>7.1f} {files:>7}")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch", type=int, default=32, help="chunks per call")
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""CPU embedding modes: load time, RAM, throughput and retrieval quality.
+
+Each mode (fp32, int8, int8 truncated to ``--dims``) loads the model in a
+fresh process through ``config.new_hf_embeddings``, so load time and peak RSS
+are measured from a cold start. Retrieval quality is recall@k of each mode's
+top-k chunks against the fp32 full-width top-k, on chunks of the repository's
+READMEs and ``static/knowledge_base.json`` with one query per knowledge base
+topic.
+
+Run:
+> python bench_embeddings.py --model sentence-transformers/all-MiniLM-L6-v2 --dims 256 128
+"""
+
+import argparse
+import json
+import multiprocessing
+import pathlib
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+REPO = pathlib.Path(__file__).resolve().parents[4]
+KNOWLEDGE_BASE = REPO / "chapter04" / "static" / "knowledge_base.json"
+
+
+def corpus() -> tuple[list[str], list[str]]:
+    entries = json.loads(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+    texts = [p.read_text(encoding="utf-8") for p in sorted(REPO.glob("**/README.md"))]
+    texts += [e["content"] for e in entries]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    chunks = [c for text in texts for c in splitter.split_text(text)]
+    queries = [
+        f"What is {e['metadata']['topic'].replace('_', ' ')}?" for e in entries
+    ] + ["How do I run the Streamlit app?", "How is the vector store persisted?"]
+    return chunks, queries
+
+
+def measure(mode: dict, model: str, batch_size: int, repeat: int) -> dict:
+    """Runs in a fresh process."""
+    from config import HFEmbeddingsSettings, new_hf_embeddings
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    embeddings = new_hf_embeddings(
+        HFEmbeddingsSettings(model_name=model, batch_size=batch_size, **mode)
+    )
+    load_seconds = time.perf_counter() - started
+
+    chunks, queries = corpus()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        vectors = embeddings.embed_documents(chunks)
+    seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "load_seconds": load_seconds,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": rss_after / 1024,
+        "model_rss_mb": (rss_after - rss_before) / 1024,
+        "chunks_per_sec": len(chunks) * repeat / seconds,
+        "dim": len(vectors[0]),
+        "vectors": np.asarray(vectors, dtype=np.float32),
+        "queries": np.asarray(embeddings.embed_documents(queries), dtype=np.float32),
+    }
+
+
+def top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+
+def main(args: argparse.Namespace) -> None:
+    modes = {"fp32": {}, "int8": {"quantize": "int8"}}
+    for dim in args.dims:
+        modes[f"int8/{dim}"] = {"quantize": "int8", "truncate_dim": dim}
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for name, mode in modes.items():
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            results[name] = pool.submit(
+                measure, mode, args.model, args.batch_size, args.repeat
+            ).result()
+
+    baseline = top_k(results["fp32"]["vectors"], results["fp32"]["queries"], args.k)
+    print(
+        f"{'mode':<10} {'dim':>5} {'load s':>7} {'model MB':>9} {'peak MB':>8} "
+        f"{'chunks/s':>9} {f'recall@{args.k}':>9}"
+    )
+    for name, r in results.items():
+        found = top_k(r["vectors"], r["queries"], args.k)
+        recall = np.mean(
+            [len(set(a) & set(b)) / args.k for a, b in zip(found, baseline)]
+        )
+        print(
+            f"{name:<10} {r['dim']:>5} {r['load_seconds']:>7.1f} "
+            f"{r['model_rss_mb']:>9.0f} {r['peak_rss_mb']:>8.0f} "
+            f"{r['chunks_per_sec']:>9.1f} {recall:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--dims", type=int, nargs="*", default=[256, 128])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus")
+    parser.add_argument("-k", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,215 @@
+"""Batch runner for the RAG graph against a local fake chat model.
+
+Starts chapter09's ``fake_llm.py`` as an OpenAI-compatible stand-in, indexes
+``static/knowledge_base.json`` into a scratch vector store, and runs a set of
+questions through ``rag.graph.abatch`` with bounded concurrency. Reports the
+latency of each node, token counts and throughput as JSON, so runs before and
+after a change can be diffed. Embeddings are real (``HF_EMBEDDINGS_MODEL``).
+
+Questions default to one per knowledge base topic; ``--questions`` takes a
+JSON list of strings instead.
+
+Run:
+> python bench_rag.py --repeat 10 --concurrency 8 --output report.json
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+
+REPO = pathlib.Path(__file__).parents[4]
+KNOWLEDGE_BASE = REPO / "chapter04" / "static" / "knowledge_base.json"
+FAKE_LLM = REPO / "chapter09" / "web-framework-deployment-with-fast-api" / "fake_llm.py"
+NODES = ("retrieve", "generate", "double_check", "doc_finalizer")
+
+
+class NodeTimer(AsyncCallbackHandler):
+    """Collects per-node latency and per-node LLM token usage."""
+
+    def __init__(self):
+        self.started: dict = {}
+        self.node_of_llm: dict = {}
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.tokens: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0}
+        )
+
+    async def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs
+    ):
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            self.started[run_id] = ("graph", time.perf_counter())
+        elif name in NODES:
+            self.started[run_id] = (name, time.perf_counter())
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.started:
+            name, started = self.started.pop(run_id)
+            self.latencies[name].append(time.perf_counter() - started)
+
+    async def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        self.node_of_llm[run_id] = (metadata or {}).get("langgraph_node", "other")
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        tokens = self.tokens[self.node_of_llm.pop(run_id, "other")]
+        tokens["llm_calls"] += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                tokens["input_tokens"] += usage.get("input_tokens", 0)
+                tokens["output_tokens"] += usage.get("output_tokens", 0)
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 1),
+        "p50_ms": at(0.5),
+        "p95_ms": at(0.95),
+        "max_ms": at(1.0),
+    }
+
+
+def load_questions(args: argparse.Namespace) -> list[str]:
+    if args.questions:
+        path = pathlib.Path(args.questions)
+        questions = json.loads(path.read_text(encoding="utf-8"))
+    else:
+        entries = json.loads(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+        topics = [e["metadata"]["topic"].replace("_", " ") for e in entries]
+        questions = [f"Write internal documentation about {t}." for t in topics]
+    return questions * args.repeat
+
+
+def start_fake_llm(args: argparse.Namespace) -> subprocess.Popen:
+    cmd = [sys.executable, str(FAKE_LLM), "--port", str(args.port)]
+    cmd += ["--latency", str(args.latency), "--ttft", str(args.ttft)]
+    cmd += ["--tokens-per-sec", str(args.tokens_per_sec)]
+    cmd += ["--output-tokens", str(args.output_tokens)]
+    proc = subprocess.Popen(cmd)
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/docs")
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("fake_llm.py didn't start")
+
+
+async def run(rag, args: argparse.Namespace, questions: list[str]) -> dict:
+    def configs(timer: NodeTimer) -> list[dict]:
+        return [
+            {
+                "configurable": {
+                    "thread_id": uuid.uuid4().hex,
+                    "bypass_llm_cache": not args.use_cache,
+                },
+                "callbacks": [timer, *rag.TRACE_CALLBACKS],
+                "max_concurrency": args.concurrency,
+            }
+            for _ in questions
+        ]
+
+    inputs = [{"messages": [HumanMessage(q)]} for q in questions]
+    # Warm up the embedding model and HTTP connections outside the timings.
+    await rag.graph.ainvoke(inputs[0], configs(NodeTimer())[0])
+
+    timer = NodeTimer()
+    started = time.perf_counter()
+    results = await rag.graph.abatch(inputs, configs(timer), return_exceptions=True)
+    wall = time.perf_counter() - started
+
+    errors = [repr(r) for r in results if isinstance(r, Exception)]
+    input_tokens = sum(t["input_tokens"] for t in timer.tokens.values())
+    output_tokens = sum(t["output_tokens"] for t in timer.tokens.values())
+    return {
+        "settings": {
+            "questions": len(questions),
+            "concurrency": args.concurrency,
+            "use_cache": args.use_cache,
+            "fake_llm": {
+                "latency": args.latency,
+                "ttft": args.ttft,
+                "tokens_per_sec": args.tokens_per_sec,
+                "output_tokens": args.output_tokens,
+            },
+        },
+        "wall_seconds": round(wall, 3),
+        "questions_per_sec": round(len(questions) / wall, 2),
+        "output_tokens_per_sec": round(output_tokens / wall, 1),
+        "errors": errors,
+        "graph": percentiles(timer.latencies["graph"]),
+        "nodes": {
+            node: {**percentiles(timer.latencies[node]), **timer.tokens.get(node, {})}
+            for node in NODES
+        },
+        "tokens": {"input": input_tokens, "output": output_tokens},
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    questions = load_questions(args)
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ.update(
+            OPENAI_API_KEY="fake",
+            OPENAI_API_BASE_URL=f"http://127.0.0.1:{args.port}/v1",
+            OPENAI_MODEL="fake",
+            VECTOR_STORE_DIR=os.path.join(scratch, "vector_index"),
+            CHECKPOINT_DB=os.path.join(scratch, "checkpoints.sqlite"),
+            LLM_CACHE_PATH=os.path.join(scratch, "llm_cache.sqlite"),
+        )
+        proc = start_fake_llm(args)
+        try:
+            # Imported late: rag reads its settings from the environment at import.
+            import rag
+
+            entries = json.loads(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+            rag.retriever.store_documents(
+                [Document(e["content"], metadata=e["metadata"]) for e in entries]
+            )
+            report = rag.run_in_graph_loop(run(rag, args, questions))
+        finally:
+            proc.terminate()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", help="JSON file with a list of questions")
+    parser.add_argument("--repeat", type=int, default=4, help="asks per question")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--use-cache", action="store_true", help="allow LLM cache hits")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--port", type=int, default=8110)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--ttft", type=float, default=0.1)
+    parser.add_argument("--tokens-per-sec", type=float, default=200)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""Query latency vs corpus size: MatrixVectorStore vs InMemoryVectorStore.
+
+Uses random unit vectors so no embedding model is needed.
+
+Run:
+> python bench_vector_store.py --sizes 1000 10000 50000 --dim 384
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+from vector_store import MatrixVectorStore
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns a precomputed vector for each ``doc-<i>`` text."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.vectors[int(t.split("-")[1])].tolist() for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def time_queries(store, queries: np.ndarray, k: int) -> float:
+    """Mean milliseconds per query."""
+    started = time.perf_counter()
+    for q in queries:
+        store.similarity_search_by_vector(q.tolist(), k=k)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(0)
+    print(
+        f"{'size':>8} {'in-memory ms':>13} {'matrix ms':>10} {'speedup':>8} "
+        f"{'load ms':>8} {'top-k match':>11}"
+    )
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        texts = [f"doc-{i}" for i in range(size)]
+        embeddings = LookupEmbeddings(vectors)
+
+        baseline = InMemoryVectorStore(embedding=embeddings)
+        baseline.add_texts(texts)
+        matrix = MatrixVectorStore(embedding=embeddings)
+        matrix.add_texts(texts)
+
+        baseline_ms = time_queries(baseline, queries, args.k)
+        matrix_ms = time_queries(matrix, queries, args.k)
+
+        with tempfile.TemporaryDirectory() as path:
+            matrix.save(path)
+            started = time.perf_counter()
+            loaded = MatrixVectorStore.load(path, embeddings)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            # Both stores must agree on the top-k.
+            q = queries[0].tolist()
+            expected = [d.page_content for d in baseline.similarity_search_by_vector(q, args.k)]
+            actual = [d.page_content for d in loaded.similarity_search_by_vector(q, args.k)]
+
+        print(
+            f"{size:>8} {baseline_ms:>13.2f} {matrix_ms:>10.3f} "
+            f"{baseline_ms / matrix_ms:>7.0f}x {load_ms:>8.1f} {str(expected == actual):>11}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    main(parser.parse_args())
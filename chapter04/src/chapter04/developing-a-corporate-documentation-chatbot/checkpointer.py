@@ -0,0 +1,141 @@
+"""SQLite checkpointer with retention for the RAG graph."""
+
+import time
+import zlib
+from typing import Any
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+_COMPRESSED = "zlib+"
+
+
+class CompressedSerializer(SerializerProtocol):
+    """Zlib-compresses serialized values larger than ``min_size`` bytes.
+
+    Checkpoints carry the retrieved ``context`` documents, whose text and
+    repetitive loader metadata compress several times over.
+    """
+
+    def __init__(self, serde: SerializerProtocol | None = None, min_size: int = 1024):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_size = min_size
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        return _COMPRESSED + type_, zlib.compress(data, 1)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.startswith(_COMPRESSED):
+            return self.serde.loads_typed(
+                (type_[len(_COMPRESSED) :], zlib.decompress(payload))
+            )
+        return self.serde.loads_typed(data)
+
+
+class RetentionSqliteSaver(AsyncSqliteSaver):
+    """``AsyncSqliteSaver`` that bounds how much history it keeps.
+
+    Each thread keeps only its newest ``max_checkpoints`` checkpoints (the
+    latest one holds the whole conversation), and threads idle for longer
+    than ``ttl_seconds`` are deleted by a sweep that runs at most every
+    ``sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        max_checkpoints: int = 20,
+        ttl_seconds: float | None = 7 * 24 * 3600,
+        sweep_interval: float = 300.0,
+        serde: SerializerProtocol | None = None,
+    ):
+        super().__init__(conn, serde=serde or CompressedSerializer())
+        self.max_checkpoints = max_checkpoints
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._retention_ready = False
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(saved["configurable"]["thread_id"])
+        checkpoint_ns = saved["configurable"]["checkpoint_ns"]
+        now = time.time()
+        async with self.lock:
+            await self._setup_retention()
+            await self.conn.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at)"
+                " VALUES (?, ?)",
+                (thread_id, now),
+            )
+            await self._prune(thread_id, checkpoint_ns)
+            if (
+                self.ttl_seconds is not None
+                and now - self._last_sweep > self.sweep_interval
+            ):
+                self._last_sweep = now
+                await self._sweep(now - self.ttl_seconds)
+            await self.conn.commit()
+        return saved
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self._setup_retention()
+            await self.conn.execute(
+                "DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),)
+            )
+            await self.conn.commit()
+
+    async def _setup_retention(self) -> None:
+        if self._retention_ready:
+            return
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity ("
+            " thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+        )
+        self._retention_ready = True
+
+    async def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        # Checkpoint ids are time-ordered uuid6 strings, so the newest sort highest.
+        await self.conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+            " AND checkpoint_id NOT IN ("
+            "  SELECT checkpoint_id FROM checkpoints"
+            "  WHERE thread_id = ? AND checkpoint_ns = ?"
+            "  ORDER BY checkpoint_id DESC LIMIT ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints),
+        )
+        await self.conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ?"
+            " AND checkpoint_id NOT IN ("
+            "  SELECT checkpoint_id FROM checkpoints"
+            "  WHERE thread_id = ? AND checkpoint_ns = ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+        )
+
+    async def _sweep(self, cutoff: float) -> None:
+        async with self.conn.execute(
+            "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (cutoff,)
+        ) as cur:
+            expired = [(thread_id,) for (thread_id,) in await cur.fetchall()]
+        for table in ("checkpoints", "writes", "thread_activity"):
+            await self.conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?", expired
+            )
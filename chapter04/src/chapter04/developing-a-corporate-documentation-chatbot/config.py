@@ -1,4 +1,8 @@
+import functools
+import logging
 import os
+import time
+from dataclasses import dataclass
 
 import dotenv
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
@@ -8,10 +12,10 @@ from langchain.embeddings import Embeddings
 class Config:
     def __init__(self):
         # By default, load_dotenv doesn't override existing environment variables and looks for a .env file in same directory as python script or searches for it incrementally higher up.
+        # Without a .env file the settings must already be in the environment (e.g. bench_rag.py).
         dotenv_path = dotenv.find_dotenv(usecwd=True)
-        if not dotenv_path:
-            raise ValueError("No .env file found")
-        dotenv.load_dotenv(dotenv_path=dotenv_path)
+        if dotenv_path:
+            dotenv.load_dotenv(dotenv_path=dotenv_path)
 
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -68,12 +72,80 @@ class Config:
             **kwargs,
         )
 
-def new_hf_embeddings(**kwargs) -> Embeddings:
+@dataclass(frozen=True)
+class HFEmbeddingsSettings:
+    """CPU 上运行 HuggingFace embedding 模型的设置。"""
+
+    model_name: str
+    # Matryoshka 模型只保留前 N 维（截断后重新归一化），None 表示不截断。
+    truncate_dim: int | None = None
+    # "int8"：对 Linear 层做动态 int8 量化，CPU 上推理更快；
+    # 进程内存并不会减少（fp32 权重先加载，实测常驻内存略高于 fp32）。
+    quantize: str | None = None
+    # 每次 encode 的批大小。
+    batch_size: int = 32
+
+    @classmethod
+    def from_env(cls, **overrides) -> "HFEmbeddingsSettings":
+        values = {
+            "model_name": os.getenv("HF_EMBEDDINGS_MODEL"),
+            "truncate_dim": int(os.getenv("HF_EMBEDDINGS_DIM", "0")) or None,
+            "quantize": os.getenv("HF_EMBEDDINGS_QUANTIZE") or None,
+            "batch_size": int(os.getenv("HF_EMBEDDINGS_BATCH_SIZE", "32")),
+            **overrides,
+        }
+        if not values["model_name"]:
+            raise ValueError("HF_EMBEDDINGS_MODEL is not set")
+        return cls(**values)
+
+    @property
+    def embedding_id(self) -> str:
+        """模型、维度与量化方式的标识：不同设置产生不同的向量。"""
+        return (
+            f"{self.model_name}:{self.truncate_dim or 'full'}:"
+            f"{self.quantize or 'fp32'}"
+        )
+
+    @property
+    def cache_namespace(self) -> str:
+        """不同设置产生不同的向量，缓存需按设置区分。"""
+        return f"{self.embedding_id}:"
+
+
+def new_hf_embeddings(
+    settings: HFEmbeddingsSettings | None = None, **kwargs
+) -> Embeddings:
     # ref: https://reference.langchain.com/python/integrations/langchain_huggingface/#langchain_huggingface.HuggingFaceEmbeddings
-    model_name = kwargs.pop("model_name", os.environ['HF_EMBEDDINGS_MODEL'])
+    return _load_hf_embeddings(settings or HFEmbeddingsSettings.from_env(**kwargs))
+
+
+# 每个进程只加载一次模型：Streamlit 每次 rerun 都会重新执行脚本，但模块级缓存会保留。
+@functools.cache
+def _load_hf_embeddings(settings: HFEmbeddingsSettings) -> HuggingFaceEmbeddings:
+    started = time.perf_counter()
+    model_kwargs = {"device": "cpu"}
+    if settings.truncate_dim:
+        model_kwargs["truncate_dim"] = settings.truncate_dim
     out = HuggingFaceEmbeddings(
-        model_name=model_name,
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": False},
+        model_name=settings.model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={
+            # 截断后的向量不再是单位长度，需要重新归一化。
+            "normalize_embeddings": settings.truncate_dim is not None,
+            "batch_size": settings.batch_size,
+        },
     )
+    if settings.quantize == "int8":
+        import torch
+
+        # _client 是底层的 SentenceTransformer 模型。
+        torch.ao.quantization.quantize_dynamic(
+            out._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    elif settings.quantize:
+        raise ValueError(f"Unsupported HF_EMBEDDINGS_QUANTIZE: {settings.quantize}")
+
+    # 预热：第一次前向计算比之后慢得多，放到加载阶段而不是用户的第一个请求里。
+    out.embed_query("warm-up")
+    logging.info(f"Loaded {settings} in {time.perf_counter() - started:.1f}s")
     return out
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""Assemble retrieved chunks into a compact, token-bounded prompt context."""
+
+import logging
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+LOGGER = logging.getLogger(__name__)
+
+# Longest overlap searched for when chunks carry no start_index; the
+# splitter's chunk_overlap is 200.
+MAX_TEXT_OVERLAP = 400
+MIN_TEXT_OVERLAP = 20
+
+
+def load_tokenizer(name: str | None):
+    """A ``tokenizers.Tokenizer`` from local files only, or None.
+
+    ``name`` is a ``tokenizer.json`` file, a directory containing one, or a
+    Hugging Face repo id that is looked up in the local HF cache; nothing is
+    downloaded.
+    """
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+
+        path = name
+        if os.path.isdir(path):
+            path = os.path.join(path, "tokenizer.json")
+        elif not os.path.isfile(path):
+            from huggingface_hub import try_to_load_from_cache
+
+            path = try_to_load_from_cache(name, "tokenizer.json")
+            if not isinstance(path, str):
+                raise FileNotFoundError("not a local file or a cached repo")
+        return Tokenizer.from_file(path)
+    except Exception as e:
+        LOGGER.warning(f"No tokenizer {name} ({e}), estimating tokens as chars / 4")
+        return None
+
+
+# Loaded once at import, i.e. at startup, never inside a request.
+TOKENIZER = load_tokenizer(os.getenv("CONTEXT_TOKENIZER", "Qwen/Qwen3-Embedding-8B"))
+
+
+def count_tokens(text: str) -> int:
+    """Token count from a local Rust tokenizer, or a chars/4 estimate without one."""
+    if TOKENIZER is None:
+        return len(text) // 4
+    return len(TOKENIZER.encode(text, add_special_tokens=False))
+
+
+@dataclass
+class PackingReport:
+    """What ``pack_context`` did to the retrieved chunks."""
+
+    chunks_in: int = 0
+    chunks_out: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def __str__(self) -> str:
+        saved = self.tokens_saved / self.tokens_in if self.tokens_in else 0.0
+        return (
+            f"{self.chunks_in} -> {self.chunks_out} chunks "
+            f"({self.merged} merged, {self.duplicates} duplicates, "
+            f"{self.dropped} over budget), {self.tokens_in} -> {self.tokens_out} "
+            f"tokens ({saved:.0%} saved)"
+        )
+
+
+def _source(doc: Document) -> tuple:
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def _overlap(first: Document, second: Document) -> int | None:
+    """Length of the prefix of ``second`` that ``first`` ends with.
+
+    None when ``second`` doesn't continue ``first``.
+    """
+    start_a = first.metadata.get("start_index")
+    start_b = second.metadata.get("start_index")
+    if start_a is not None and start_b is not None:
+        end_a = start_a + len(first.page_content)
+        if not start_a <= start_b <= end_a:
+            return None
+        return min(end_a - start_b, len(second.page_content))
+
+    # Chunks indexed without start_index: look for the overlap in the text.
+    a, b = first.page_content, second.page_content
+    for size in range(min(len(a), len(b), MAX_TEXT_OVERLAP), MIN_TEXT_OVERLAP - 1, -1):
+        if a.endswith(b[:size]):
+            return size
+    return None
+
+
+def merge_adjacent(docs: list[Document]) -> tuple[list[Document], int]:
+    """Merge chunks of the same source that overlap or touch.
+
+    ``docs`` is in relevance order; a merged chunk takes the position of its
+    most relevant part. Returns the chunks and how many merges were made.
+    """
+    total = 0
+    while True:
+        # A merged chunk may now reach a chunk neither part touched alone.
+        docs, merges = _merge_pass(docs)
+        total += merges
+        if not merges:
+            return docs, total
+
+
+def _merge_pass(docs: list[Document]) -> tuple[list[Document], int]:
+    merged: list[Document] = []
+    merges = 0
+    for doc in docs:
+        for i, kept in enumerate(merged):
+            combined = _merge(kept, doc)
+            if combined is not None:
+                merged[i] = combined
+                merges += 1
+                break
+        else:
+            merged.append(doc)
+    return merged, merges
+
+
+def _merge(a: Document, b: Document) -> Document | None:
+    if _source(a) != _source(b):
+        return None
+    for first, second in ((a, b), (b, a)):
+        size = _overlap(first, second)
+        if size is not None:
+            return Document(
+                page_content=first.page_content + second.page_content[size:],
+                metadata=dict(first.metadata),
+            )
+    return None
+
+
+def _shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(
+    docs: list[Document], threshold: float = 0.9
+) -> tuple[list[Document], int]:
+    """Drop chunks at least ``threshold`` similar to a chunk already kept.
+
+    Similarity is the Jaccard index of the chunks' word 3-grams.
+    """
+    kept: list[tuple[Document, set]] = []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(
+            len(shingles & other) / (len(shingles | other) or 1) >= threshold
+            for _, other in kept
+        ):
+            continue
+        kept.append((doc, shingles))
+    return [doc for doc, _ in kept], len(docs) - len(kept)
+
+
+def pack_context(
+    docs: list[Document],
+    max_tokens: int,
+    tokens: Callable[[str], int] | None = None,
+    duplicate_threshold: float = 0.9,
+) -> tuple[list[Document], PackingReport]:
+    """Merge, dedupe and budget ``docs`` (most relevant first) for the prompt.
+
+    Chunks are added in relevance order while they fit in ``max_tokens``;
+    one that doesn't fit is skipped so a smaller, less relevant one can.
+    """
+    tokens = tokens or count_tokens
+    report = PackingReport(
+        chunks_in=len(docs), tokens_in=sum(tokens(d.page_content) for d in docs)
+    )
+    docs, report.merged = merge_adjacent(docs)
+    docs, report.duplicates = drop_near_duplicates(docs, duplicate_threshold)
+
+    packed = []
+    for doc in docs:
+        size = tokens(doc.page_content)
+        if report.tokens_out + size > max_tokens:
+            report.dropped += 1
+            continue
+        packed.append(doc)
+        report.tokens_out += size
+    report.chunks_out = len(packed)
+    return packed, report
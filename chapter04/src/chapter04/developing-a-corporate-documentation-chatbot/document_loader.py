@@ -1,7 +1,12 @@
 """Utility functions for document loading."""
 
 import logging
+import multiprocessing
 import pathlib
+import queue
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
 
 from langchain_community.document_loaders.epub import UnstructuredEPubLoader
@@ -40,19 +45,124 @@ class DocumentLoader(object):
     }
 
 
-def load_document(temp_filepath: str) -> list[Document]:
-    """Load a file and return it as a list of documents.
-
-    Doesn't handle a lot of errors at the moment.
-    """
+def _new_loader(temp_filepath: str):
     ext = pathlib.Path(temp_filepath).suffix
     loader = DocumentLoader.supported_extensions.get(ext)
     if not loader:
         raise DocumentLoaderException(
             f"Invalid extension type {ext}, cannot load this type of file"
         )
+    return loader(temp_filepath)
+
+
+def lazy_load_document(temp_filepath: str) -> Iterator[Document]:
+    """Yield the pages/elements of a file as the loader produces them."""
+    yield from _new_loader(temp_filepath).lazy_load()
 
-    loaded = loader(temp_filepath)
-    docs = loaded.load()
-    logging.info(docs)
+
+def load_document(temp_filepath: str) -> list[Document]:
+    """Load a file and return it as a list of documents.
+
+    Doesn't handle a lot of errors at the moment.
+    """
+    docs = list(lazy_load_document(temp_filepath))
+    # Log a summary only; formatting every page into the log costs as much as parsing.
+    LOGGER.info(
+        f"Loaded {temp_filepath}: {len(docs)} documents, "
+        f"{sum(len(d.page_content) for d in docs)} chars"
+    )
     return docs
+
+
+_DONE = "done"
+_ERROR = "error"
+
+
+def _parse_into_queue(temp_filepath: str, pages, stop) -> None:
+    """Runs in a worker process: stream parsed pages back through ``pages``.
+
+    Gives up at the next page once ``stop`` is set.
+    """
+    try:
+        for doc in lazy_load_document(temp_filepath):
+            if stop.is_set():
+                return
+            pages.put((None, doc))
+        pages.put((_DONE, None))
+    except Exception as e:
+        pages.put((_ERROR, f"{type(e).__name__}: {e}"))
+
+
+class DocumentLoaderService:
+    """Parses files in a process pool and streams back their pages.
+
+    Parsing PDF/EPUB/DOCX is CPU-bound, so running it in worker processes
+    keeps it off the Streamlit thread and lets several files parse in
+    parallel. ``stream`` yields each page as soon as a worker produces it,
+    so splitting and embedding can start before the whole file is parsed.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs Streamlit's threads is unsafe.
+                ctx = multiprocessing.get_context("spawn")
+                self._manager = ctx.Manager()
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=ctx)
+
+    def stream(self, temp_filepath: str) -> Iterator[Document]:
+        """Parse ``temp_filepath`` in a worker process, yielding pages lazily.
+
+        Closing the iterator early, or dropping it, stops the worker.
+        """
+        # Fail fast on unsupported files without a round-trip to a worker.
+        _new_loader(temp_filepath)
+        self._start()
+        pages = self._manager.Queue()
+        stop = self._manager.Event()
+        future = self._executor.submit(_parse_into_queue, temp_filepath, pages, stop)
+        count = 0
+        try:
+            while True:
+                try:
+                    status, payload = pages.get(timeout=1.0)
+                except queue.Empty:
+                    if not future.done():
+                        continue
+                    # The worker may have finished right after the timeout, so
+                    # drain what it queued before deciding it died.
+                    try:
+                        status, payload = pages.get_nowait()
+                    except queue.Empty:
+                        future.result()
+                        raise DocumentLoaderException(
+                            f"Worker exited parsing {temp_filepath}"
+                        ) from None
+                if status == _DONE:
+                    break
+                if status == _ERROR:
+                    raise DocumentLoaderException(
+                        f"Failed to parse {temp_filepath}: {payload}"
+                    )
+                count += 1
+                yield payload
+            future.result()
+        finally:
+            if not future.done() and not future.cancel():
+                # Already running: the worker checks ``stop`` between pages.
+                stop.set()
+        LOGGER.info(f"Parsed {temp_filepath}: {count} documents")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._manager.shutdown()
+                self._executor = None
+                self._manager = None
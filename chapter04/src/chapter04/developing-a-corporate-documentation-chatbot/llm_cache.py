@@ -0,0 +1,108 @@
+"""Persistent LLM response cache."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any
+
+from embedding_cache import SQLiteByteStore
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+# Only what chat models return may be revived from the cache file.
+_ALLOWED_OBJECTS = [Generation, ChatGeneration, AIMessage]
+# Misses timed at once; a failed call never reaches update(), so the oldest
+# timings are dropped beyond this.
+MAX_PENDING = 1024
+
+
+class SQLiteLLMCache(BaseCache):
+    """LLM cache stored in one SQLite file, see ``SQLiteByteStore``.
+
+    Entries are keyed by a hash of the model's ``llm_string`` (model name and
+    parameters) and the serialized prompt, and evicted least recently used
+    once they exceed ``max_bytes``. Each entry remembers how long the call
+    took and the tokens it used, so ``metrics`` can report what hits saved.
+    """
+
+    def __init__(self, path: str, max_bytes: int | None = None, enabled: bool = True):
+        self.store = SQLiteByteStore(path, max_bytes=max_bytes)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Misses waiting for their response, for timing the call.
+        self._pending: OrderedDict[str, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_input_tokens = 0
+        self.saved_output_tokens = 0
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        if not self.enabled:
+            return None
+        key = self.key(prompt, llm_string)
+        (value,) = self.store.mget([key])
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                self._pending[key] = time.perf_counter()
+                self._pending.move_to_end(key)
+                if len(self._pending) > MAX_PENDING:
+                    self._pending.popitem(last=False)
+                return None
+            entry = json.loads(value)
+            self.hits += 1
+            self.saved_seconds += entry["seconds"]
+            self.saved_input_tokens += entry["input_tokens"]
+            self.saved_output_tokens += entry["output_tokens"]
+        return [
+            loads(g, allowed_objects=_ALLOWED_OBJECTS) for g in entry["generations"]
+        ]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not self.enabled:
+            return
+        key = self.key(prompt, llm_string)
+        with self._lock:
+            started = self._pending.pop(key, None)
+        usage = _usage(return_val)
+        entry = {
+            "generations": [dumps(g) for g in return_val],
+            "seconds": time.perf_counter() - started if started else 0.0,
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+        }
+        self.store.mset([(key, json.dumps(entry).encode())])
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.mdelete(list(self.store.yield_keys()))
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_input_tokens": self.saved_input_tokens,
+            "saved_output_tokens": self.saved_output_tokens,
+            "size_bytes": self.store.size_bytes,
+        }
+
+
+def _usage(generations: Sequence) -> dict:
+    total = {"input_tokens": 0, "output_tokens": 0}
+    for generation in generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        for name in total:
+            total[name] += (usage or {}).get(name, 0)
+    return total
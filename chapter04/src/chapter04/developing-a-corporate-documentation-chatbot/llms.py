@@ -1,23 +1,40 @@
 """Loading LLMs and Embeddings."""
 
+import os
+
 from config import Config
 import config
-from langchain_classic.embeddings import CacheBackedEmbeddings
-from langchain_classic.storage import LocalFileStore
+from embedding_cache import SQLiteByteStore, cache_backed_embeddings
+from llm_cache import SQLiteLLMCache
+
+# Repeated prompts (e.g. re-reviewing an identical draft) are answered from disk.
+LLM_CACHE = SQLiteLLMCache(
+    os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite"),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    enabled=os.getenv("LLM_CACHE", "on") != "off",
+)
 
 chat_model = Config().new_openai_like(
     temperature=0,
     max_tokens=None,
     timeout=None,
     max_retries=2,
+    cache=LLM_CACHE,
 )
+# For runs that must not read or write the cache, see rag._model().
+uncached_chat_model = chat_model.model_copy(update={"cache": False})
 
-store = LocalFileStore("./cache/")
+# One SQLite file instead of one file per cached chunk; LRU-evicted past the limit.
+store = SQLiteByteStore(
+    os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite"),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+)
 
 # underlying_embeddings = Config().new_openai_like_embeddings()
-underlying_embeddings = config.new_hf_embeddings()
+embeddings_settings = config.HFEmbeddingsSettings.from_env()
+underlying_embeddings = config.new_hf_embeddings(embeddings_settings)
 
 # Avoiding unnecessary costs by caching the embeddings.
-EMBEDDINGS = CacheBackedEmbeddings.from_bytes_store(
-    underlying_embeddings, store, namespace='hello-world'
+EMBEDDINGS = cache_backed_embeddings(
+    underlying_embeddings, store, namespace=embeddings_settings.cache_namespace
 )
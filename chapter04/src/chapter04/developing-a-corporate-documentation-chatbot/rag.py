@@ -17,17 +17,26 @@ Note: More details on performance measurement and observability will be covered
 
 """
 
+import asyncio
+import os
+import threading
+import uuid
+from collections.abc import AsyncIterator, Iterator
 from typing import Annotated
 
+import aiosqlite
+from checkpointer import RetentionSqliteSaver
+from context_packing import pack_context
 from langchain_core.documents import Document
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 from langgraph.constants import END
 from langgraph.graph import START, StateGraph, add_messages
-from llms import chat_model
+from llms import chat_model, uncached_chat_model
 from retriever import DocumentRetriever
 from typing_extensions import TypedDict
+from utils import TracingCallbackHandler
 
 system_prompt = (
     "You're a helpful AI assistant. Given a user question "
@@ -40,6 +49,11 @@ system_prompt = (
 )
 
 retriever = DocumentRetriever()
+# Prompt tokens allowed for retrieved context, see pack_context().
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+# Node, LLM and retriever spans of every run, written to TRACE_FILE when set.
+TRACER = TracingCallbackHandler.from_env()
+TRACE_CALLBACKS = [TRACER] if TRACER else []
 prompt = ChatPromptTemplate.from_messages(
     [
         ("system", system_prompt),
@@ -58,25 +72,35 @@ class State(TypedDict):
     messages: Annotated[list, add_messages]
 
 
+def _model(config: RunnableConfig):
+    """The chat model, skipping LLM_CACHE if the run sets ``bypass_llm_cache``."""
+    if config.get("configurable", {}).get("bypass_llm_cache"):
+        return uncached_chat_model
+    return chat_model
+
+
 # Define application steps
-def retrieve(state: State):
-    retrieved_docs = retriever.invoke(state["messages"][-1].content)
+async def retrieve(state: State):
+    retrieved_docs = await retriever.ainvoke(state["messages"][-1].content)
     print(retrieved_docs)
     return {"context": retrieved_docs}
 
 
-def generate(state: State):
-    docs_content = "\n\n".join(doc.page_content for doc in state["context"])
+async def generate(state: State, config: RunnableConfig):
+    docs, report = pack_context(state["context"], CONTEXT_MAX_TOKENS)
+    print(f"context: {report}")
+    docs_content = "\n\n".join(doc.page_content for doc in docs)
     messages = prompt.invoke(
         {"question": state["messages"][-1].content, "context": docs_content}
     )
-    response = chat_model.invoke(messages)
+    # Streamed token by token to the UI by astream_answer().
+    response = await _model(config).ainvoke(messages)
     print(response.content)
     return {"answer": response.content}
 
 
-def double_check(state: State):
-    result = chat_model.invoke(
+async def double_check(state: State, config: RunnableConfig):
+    result = await _model(config).ainvoke(
         [
             {
                 "role": "user",
@@ -107,10 +131,10 @@ def double_check(state: State):
 
 # NODE: doc_finalizer
 # Finalizes the documentation by incorporating feedback if available.
-def doc_finalizer(state: State):
+async def doc_finalizer(state: State, config: RunnableConfig):
     """Finalize documentation by integrating human feedback."""
     if "issues_detected" in state and state["issues_detected"]:
-        response = chat_model.invoke(
+        response = await _model(config).ainvoke(
             [
                 {
                     "role": "user",
@@ -132,15 +156,80 @@ graph_builder = StateGraph(State).add_sequence(
 )
 graph_builder.add_edge(START, "retrieve")
 graph_builder.add_edge("doc_finalizer", END)
-memory = MemorySaver()
-graph = graph_builder.compile(checkpointer=memory)
-config = {"configurable": {"thread_id": "abc123"}}
 
-if __name__ == "__main__":
-    from langchain_core.messages import HumanMessage
+# One long-lived loop for sync callers such as Streamlit, so the chat model's
+# async HTTP client isn't bound to a loop that has since been closed.
+_LOOP = asyncio.new_event_loop()
+threading.Thread(target=_LOOP.run_forever, name="rag-loop", daemon=True).start()
+
+
+async def _open_checkpointer() -> RetentionSqliteSaver:
+    # The saver binds to the running loop, so it's created on _LOOP.
+    return RetentionSqliteSaver(
+        aiosqlite.connect(os.getenv("CHECKPOINT_DB", "./checkpoints.sqlite")),
+        max_checkpoints=int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20")),
+        ttl_seconds=float(os.getenv("CHECKPOINT_TTL_HOURS", "168")) * 3600,
+    )
 
-    input_messages = [HumanMessage("What's the square root of 10?")]
 
-    response = graph.invoke({"messages": input_messages}, config=config)
+def run_in_graph_loop(coro):
+    """Run ``coro`` on the loop the graph and its checkpointer live on."""
+    return asyncio.run_coroutine_threadsafe(coro, _LOOP).result()
+
+
+checkpointer = run_in_graph_loop(_open_checkpointer())
+graph = graph_builder.compile(checkpointer=checkpointer)
+
+
+def new_session_config() -> dict:
+    """Graph config for a new conversation, with its own checkpoint thread."""
+    return {
+        "configurable": {"thread_id": uuid.uuid4().hex},
+        "callbacks": TRACE_CALLBACKS,
+    }
+
+
+async def astream_answer(question: str, config: dict) -> AsyncIterator[tuple[str, str]]:
+    """Run the graph for ``question``, streaming the draft as it's written.
+
+    Yields ``("draft", token)`` for each token ``generate`` produces,
+    ``("step", node)`` as each node finishes and finally
+    ``("final", content)`` with the finalized document.
+    """
+    async for mode, chunk in graph.astream(
+        {"messages": [HumanMessage(question)]},
+        config=config,
+        stream_mode=["messages", "updates"],
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "generate" and message.content:
+                yield "draft", message.content
+            continue
+        for node, update in chunk.items():
+            if node == "doc_finalizer":
+                yield "final", update["messages"][-1].content
+            else:
+                yield "step", node
+
+
+def stream_answer(question: str, config: dict) -> Iterator[tuple[str, str]]:
+    """Blocking iterator over ``astream_answer``."""
+    events = astream_answer(question, config)
+    try:
+        while True:
+            try:
+                yield run_in_graph_loop(anext(events))
+            except StopAsyncIteration:
+                return
+    finally:
+        run_in_graph_loop(events.aclose())
 
-    print(response["messages"][-1].content)
+
+if __name__ == "__main__":
+    config = new_session_config()
+    for kind, value in stream_answer("What's the square root of 10?", config):
+        if kind == "draft":
+            print(value, end="", flush=True)
+        elif kind == "final":
+            print(f"\n\n{value}")
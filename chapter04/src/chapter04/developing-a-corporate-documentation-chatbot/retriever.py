@@ -1,24 +1,93 @@
 """Retriever module."""
 
+import hashlib
 import os
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Any
 
-from document_loader import load_document
+from document_loader import DocumentLoaderService
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from llms import EMBEDDINGS
+from llms import EMBEDDINGS, embeddings_settings
+from utils import RecursiveTextSplitter
+from vector_store import EmbeddingMismatchError, MatrixVectorStore
 
-VECTOR_STORE = InMemoryVectorStore(embedding=EMBEDDINGS)
+# Persisted across restarts, see MatrixVectorStore.save(); an index built with
+# other embedding settings is refused rather than re-embedded during startup.
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./vector_index/")
+try:
+    VECTOR_STORE = MatrixVectorStore.load_or_create(
+        VECTOR_STORE_DIR, EMBEDDINGS, embedding_id=embeddings_settings.embedding_id
+    )
+except EmbeddingMismatchError as e:
+    raise EmbeddingMismatchError(
+        f"{e}. Restore the HF_EMBEDDINGS_* settings it was built with, or delete "
+        f"{VECTOR_STORE_DIR} and upload the documents again to rebuild it"
+    ) from None
+# Guards VECTOR_STORE between the ingestion worker and queries.
+VECTOR_STORE_LOCK = threading.RLock()
+
+# Chunks embedded per call, which is also the granularity of progress updates.
+EMBEDDING_BATCH_SIZE = 32
+
+# start_index lets context packing merge overlapping neighbours.
+TEXT_SPLITTER = RecursiveTextSplitter(
+    chunk_size=1500, chunk_overlap=200, add_start_index=True
+)
+
+# Uploads are parsed and embedded off the Streamlit script thread, several at a time.
+INGESTION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ingestion")
+# Parses files in worker processes, see DocumentLoaderService.
+LOADER_SERVICE = DocumentLoaderService()
+# Ingestion jobs by content hash; module state survives Streamlit reruns.
+INGESTION_JOBS: dict[str, "IngestionJob"] = {}
+INGESTION_LOCK = threading.Lock()
+# sha256 of uploaded files by Streamlit file_id, so reruns don't rehash.
+_FILE_HASHES: dict[str, str] = {}
 
 
 def split_documents(docs: list[Document]) -> list[Document]:
     """Split each document."""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
-    return text_splitter.split_documents(docs)
+    return TEXT_SPLITTER.split_documents(docs)
+
+
+@dataclass
+class IngestionJob:
+    """Progress of one uploaded file through parsing and embedding."""
+
+    name: str
+    content_hash: str
+    # queued -> parsing -> embedding -> done, or failed
+    status: str = "queued"
+    done_chunks: int = 0
+    total_chunks: int = 0
+    error: str = ""
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        if not self.total_chunks:
+            return 0.0
+        return self.done_chunks / self.total_chunks
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+def _content_hash(file) -> str:
+    file_id = getattr(file, "file_id", None)
+    if file_id and file_id in _FILE_HASHES:
+        return _FILE_HASHES[file_id]
+    content_hash = hashlib.sha256(file.getvalue()).hexdigest()
+    if file_id:
+        _FILE_HASHES[file_id] = content_hash
+    return content_hash
 
 
 class DocumentRetriever(BaseRetriever):
@@ -29,36 +98,111 @@ class DocumentRetriever(BaseRetriever):
 
     def model_post_init(self, ctx: Any) -> None:
         self.store_documents(self.documents)
+        # Files indexed by an earlier process count as done.
+        with INGESTION_LOCK:
+            for content_hash in VECTOR_STORE.metadata_values("content_hash"):
+                INGESTION_JOBS.setdefault(
+                    content_hash,
+                    IngestionJob(name="", content_hash=content_hash, status="done"),
+                )
 
     @staticmethod
     def store_documents(docs: list[Document]) -> None:
         """Add documents to the vector store."""
         splits = split_documents(docs)
-        VECTOR_STORE.add_documents(splits)
-
-    def add_uploaded_docs(self, uploaded_files):
-        """Add uploaded documents."""
-        docs = []
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for file in uploaded_files:
-                temp_filepath = os.path.join(temp_dir, file.name)
+        if not splits:
+            return
+        with VECTOR_STORE_LOCK:
+            VECTOR_STORE.add_documents(splits)
+            VECTOR_STORE.save(VECTOR_STORE_DIR)
+
+    def add_uploaded_docs(self, uploaded_files) -> list[IngestionJob]:
+        """Queue uploaded documents for ingestion.
+
+        Files are keyed by content hash, so a file that is already indexed or
+        queued is a no-op. Returns the jobs for ``uploaded_files``.
+        """
+        jobs = []
+        for file in uploaded_files:
+            content_hash = _content_hash(file)
+            with INGESTION_LOCK:
+                job = INGESTION_JOBS.get(content_hash)
+                if job is not None and job.status != "failed":
+                    job.name = job.name or file.name
+                    jobs.append(job)
+                    continue
+                job = IngestionJob(name=file.name, content_hash=content_hash)
+                INGESTION_JOBS[content_hash] = job
+            INGESTION_EXECUTOR.submit(self._ingest, job, file.getvalue())
+            jobs.append(job)
+        return jobs
+
+    @staticmethod
+    def ingestion_jobs() -> list[IngestionJob]:
+        """Jobs for files uploaded in this process."""
+        with INGESTION_LOCK:
+            return [job for job in INGESTION_JOBS.values() if job.name]
+
+    def _ingest(self, job: IngestionJob, data: bytes) -> None:
+        try:
+            job.status = "parsing"
+            docs = []
+            splits = []
+            vectors = []
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_filepath = os.path.join(temp_dir, job.name)
                 # Write file content first
                 with open(temp_filepath, "wb") as f:
-                    f.write(file.getvalue())
-                # Load document AFTER file is closed
-                try:
-                    docs.extend(load_document(temp_filepath))
-                except Exception as e:
-                    print(f"Failed to load {file.name}: {e}")
-                    continue
+                    f.write(data)
+                # Split and embed pages while the rest of the file is still parsing
+                for doc in LOADER_SERVICE.stream(temp_filepath):
+                    docs.append(doc)
+                    splits.extend(split_documents([doc]))
+                    job.total_chunks = len(splits)
+                    if len(splits) - len(vectors) >= EMBEDDING_BATCH_SIZE:
+                        job.status = "embedding"
+                        self._embed_pending(job, splits, vectors)
+            job.status = "embedding"
+            self._embed_pending(job, splits, vectors)
+
+            texts = [split.page_content for split in splits]
+            for i, split in enumerate(splits):
+                split.metadata["content_hash"] = job.content_hash
+                # Stable ids make re-ingesting the same file overwrite, not duplicate.
+                split.id = f"{job.content_hash}:{i}"
 
-        self.documents.extend(docs)
-        self.store_documents(docs)
+            # Only the append itself holds the lock queries wait on.
+            with VECTOR_STORE_LOCK:
+                VECTOR_STORE.add_vectors(
+                    texts,
+                    vectors,
+                    [split.metadata for split in splits],
+                    ids=[split.id for split in splits],
+                )
+                VECTOR_STORE.save(VECTOR_STORE_DIR)
+            self.documents.extend(docs)
+            job.status = "done"
+        except Exception as e:
+            print(f"Failed to load {job.name}: {e}")
+            job.error = str(e)
+            job.status = "failed"
+
+    @staticmethod
+    def _embed_pending(
+        job: IngestionJob, splits: list[Document], vectors: list[list[float]]
+    ) -> None:
+        """Embed the splits that don't have a vector yet, batch by batch."""
+        while len(vectors) < len(splits):
+            batch = splits[len(vectors) : len(vectors) + EMBEDDING_BATCH_SIZE]
+            vectors.extend(EMBEDDINGS.embed_documents([s.page_content for s in batch]))
+            job.done_chunks = len(vectors)
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> list[Document]:
         """Sync implementations for retriever."""
-        if len(self.documents) == 0:
+        if len(VECTOR_STORE) == 0:
             return []
-        return VECTOR_STORE.similarity_search(query=query, k=self.k)
+        embedding = EMBEDDINGS.embed_query(query)
+        with VECTOR_STORE_LOCK:
+            return VECTOR_STORE.similarity_search_by_vector(embedding, k=self.k)
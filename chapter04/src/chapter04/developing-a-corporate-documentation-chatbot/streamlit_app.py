@@ -6,8 +6,8 @@ Run this as follows:
 
 import streamlit as st
 from document_loader import DocumentLoader
-from langchain_core.messages import HumanMessage
-from rag import config, graph, retriever
+from llms import LLM_CACHE
+from rag import new_session_config, retriever, stream_answer
 
 # Set page configuration
 st.set_page_config(page_title="Corporate Documentation Manager", layout="wide")
@@ -17,6 +17,9 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = []
+# Each browser session gets its own conversation thread in the checkpointer
+if "graph_config" not in st.session_state:
+    st.session_state.graph_config = new_session_config()
 
 # Display chat messages from history on app rerun
 for message in st.session_state.chat_history:
@@ -24,27 +27,53 @@ for message in st.session_state.chat_history:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# Take all uploaded files
-docs = retriever.add_uploaded_docs(st.session_state.uploaded_files)
 
+@st.fragment(run_every=1.0)
+def show_ingestion_progress():
+    """Refresh ingestion progress without rerunning the whole app."""
+    for job in retriever.ingestion_jobs():
+        if job.status == "failed":
+            st.error(f"{job.name}: {job.error}")
+        elif job.status == "done":
+            st.caption(f"✅ {job.name}")
+        else:
+            st.progress(
+                job.progress,
+                text=f"{job.name}: {job.status} ({job.done_chunks}/{job.total_chunks} chunks)",
+            )
 
-def process_message(message):
-    """Assistant response.
 
-    Note: this ignores the previous messages
+STEP_CAPTIONS = {
+    "retrieve": "Writing draft...",
+    "generate": "Checking compliance...",
+    "double_check": "Finalizing document...",
+}
+
 
-    There's some better way to stream this:
-    for event in graph.stream(
-            {"messages": HumanMessage(message)}, config=config
-    ):
-        print(event.key())
-        if event.key == "doc_finalizer":
-            for value in event.values():
-                yield value["messages"][-1].content
+def process_message(message):
+    """Assistant response, showing the draft while it's being written.
 
+    Note: this ignores the previous messages
     """
-    response = graph.invoke({"messages": HumanMessage(message)}, config=config)
-    return response["messages"][-1].content
+    draft = st.empty()
+    status = st.empty()
+    tokens = []
+    final = ""
+    config = st.session_state.graph_config
+    if st.session_state.get("bypass_llm_cache"):
+        configurable = {**config["configurable"], "bypass_llm_cache": True}
+        config = {**config, "configurable": configurable}
+    for kind, value in stream_answer(message, config):
+        if kind == "draft":
+            tokens.append(value)
+            draft.markdown("".join(tokens) + "▌")
+        elif kind == "step":
+            status.caption(STEP_CAPTIONS.get(value, ""))
+        else:
+            final = value
+    status.empty()
+    draft.markdown(final)
+    return final
 
 
 # Project description using markdown
@@ -81,9 +110,8 @@ with col1:
             st.markdown(user_message)
         # Add user message to chat history
         st.session_state.chat_history.append({"role": "User", "content": user_message})
-        response = process_message(user_message)
         with st.chat_message("Assistant"):
-            st.markdown(response)
+            response = process_message(user_message)
         # Add response to chat history
         st.session_state.chat_history.append({"role": "Assistant", "content": response})
 
@@ -97,6 +125,20 @@ with col2:
         accept_multiple_files=True,
     )
     if uploaded_files:
-        for file in uploaded_files:
-            if file.name not in st.session_state.uploaded_files:
-                st.session_state.uploaded_files.append(file)
+        known = {f.file_id for f in st.session_state.uploaded_files}
+        new_files = [f for f in uploaded_files if f.file_id not in known]
+        st.session_state.uploaded_files.extend(new_files)
+        # Queue only new uploads for background ingestion; reruns skip the rest
+        retriever.add_uploaded_docs(new_files)
+
+    show_ingestion_progress()
+
+    st.subheader("LLM Cache")
+    st.checkbox("Bypass cache", key="bypass_llm_cache")
+    metrics = LLM_CACHE.metrics()
+    st.caption(
+        f"Hit rate {metrics['hit_rate']:.0%} "
+        f"({metrics['hits']}/{metrics['hits'] + metrics['misses']}), "
+        f"saved {metrics['saved_seconds']:.1f}s and "
+        f"{metrics['saved_input_tokens'] + metrics['saved_output_tokens']} tokens"
+    )
@@ -0,0 +1,378 @@
+"""NumPy matrix-backed vector store."""
+
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+DOCSTORE_FILE = "docstore.json"
+# Names the snapshot directory that holds the current vectors and docstore.
+MANIFEST_FILE = "manifest.json"
+SNAPSHOTS_DIR = "snapshots"
+
+
+class EmbeddingMismatchError(ValueError):
+    """The saved vectors come from other embeddings than the ones given."""
+
+
+class MatrixVectorStore(VectorStore):
+    """Keeps all embeddings in one contiguous float32 matrix.
+
+    Rows are L2-normalized on insert, so cosine similarity for a query is a
+    single matrix-vector product, and top-k is picked with ``argpartition``.
+    The matrix grows by doubling its capacity. ``save`` writes it as a ``.npy``
+    file that ``load`` memory-maps, so a restart doesn't re-embed anything.
+
+    On disk, ``path/manifest.json`` names the snapshot directory holding the
+    matrix and the documents; ``save`` writes a new snapshot and then swaps
+    the manifest, so the two files always come from the same save. The
+    manifest also records ``embedding_id``, which names the model and
+    settings that produced the vectors, so they are never searched with
+    query vectors from another model.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        initial_capacity: int = 1024,
+        embedding_id: str | None = None,
+    ):
+        self.embedding = embedding
+        self.embedding_id = embedding_id
+        self._matrix: np.ndarray | None = None
+        self._capacity = initial_capacity
+        self._size = 0
+        self._ids: list[str] = []
+        self._docs: list[Document] = []
+        self._rows: dict[str, int] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int | None:
+        """Vector dimension, None until the first vector is added."""
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str | None] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(texts, vectors, metadatas, ids=ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str | None] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = await self.embedding.aembed_documents(texts)
+        return self.add_vectors(texts, vectors, metadatas, ids=ids)
+
+    def add_vectors(
+        self,
+        texts: list[str],
+        vectors: list[list[float]] | np.ndarray,
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str | None] | None = None,
+    ) -> list[str]:
+        """Add texts whose embeddings were already computed."""
+        if not texts:
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError(
+                f"Expected {len(texts)} vectors, got an array of shape {vectors.shape}"
+            )
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Vectors have dimension {vectors.shape[1]}, the store has {self.dim}"
+            )
+        vectors = _normalize(vectors)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [i or str(uuid.uuid4()) for i in (ids or [None] * len(texts))]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in one add_vectors call")
+
+        # Replace existing ids in place, append the rest.
+        new_rows = []
+        for i, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            row = self._rows.get(doc_id)
+            if row is None:
+                new_rows.append(i)
+                continue
+            self._writable()[row] = vectors[i]
+            self._docs[row] = Document(id=doc_id, page_content=text, metadata=metadata)
+
+        self._reserve(self._size + len(new_rows), vectors.shape[1])
+        start = self._size
+        self._matrix[start : start + len(new_rows)] = vectors[new_rows]
+        for offset, i in enumerate(new_rows):
+            self._rows[ids[i]] = start + offset
+            self._ids.append(ids[i])
+            self._docs.append(
+                Document(id=ids[i], page_content=texts[i], metadata=metadatas[i])
+            )
+        self._size += len(new_rows)
+        return ids
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        """Delete rows by moving the last row into each freed slot."""
+        if ids is None:
+            return False
+        matrix = self._writable()
+        for doc_id in ids:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                matrix[row] = matrix[last]
+                self._ids[row] = self._ids[last]
+                self._docs[row] = self._docs[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._docs.pop()
+            self._size -= 1
+        return True
+
+    def metadata_values(self, key: str) -> set:
+        """Distinct values of metadata ``key`` across stored documents."""
+        return {d.metadata[key] for d in self._docs if key in d.metadata}
+
+    def get_by_ids(self, ids: list[str], /) -> list[Document]:
+        return [self._docs[self._rows[i]] for i in ids if i in self._rows]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Callable[[Document], bool] | None = None,
+    ) -> list[tuple[Document, float]]:
+        if self._size == 0 or k <= 0:
+            return []
+        if len(embedding) != self.dim:
+            raise ValueError(
+                f"Query has dimension {len(embedding)}, the store has {self.dim}"
+            )
+        query = _normalize(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        scores = self._matrix[: self._size] @ query
+
+        if filter is not None:
+            # Walk the full ranking until k documents pass the filter.
+            results = []
+            for row in np.argsort(-scores):
+                if filter(self._docs[row]):
+                    results.append((self._docs[row], float(scores[row])))
+                    if len(results) == k:
+                        break
+            return results
+
+        if k < self._size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self._size)
+        top = top[np.argsort(-scores[top])]
+        return [(self._docs[row], float(scores[row])) for row in top]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        results = self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+        return [doc for doc, _ in results]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] mapped to [0, 1].
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> "MatrixVectorStore":
+        store = cls(embedding=embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+    def save(self, path: str) -> None:
+        """Write the matrix and documents to directory ``path``."""
+        snapshot = uuid.uuid4().hex
+        snapshot_path = os.path.join(path, SNAPSHOTS_DIR, snapshot)
+        os.makedirs(snapshot_path)
+
+        if self._size:
+            matrix = self._matrix[: self._size]
+        else:
+            matrix = np.empty((0, 0), np.float32)
+        with open(os.path.join(snapshot_path, VECTORS_FILE), "wb") as f:
+            np.save(f, matrix)
+        docstore_path = os.path.join(snapshot_path, DOCSTORE_FILE)
+        with open(docstore_path, "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    {"id": d.id, "page_content": d.page_content, "metadata": d.metadata}
+                    for d in self._docs
+                ],
+                f,
+                ensure_ascii=False,
+            )
+
+        # Swapping the manifest publishes both files at once; a crash before
+        # it leaves the previous snapshot current.
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "snapshot": snapshot,
+                    "size": self._size,
+                    "dim": self.dim,
+                    "embedding_id": self.embedding_id,
+                },
+                f,
+            )
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # Drop the previous snapshot and any left by a crashed save. A loaded
+        # store may still memory-map one, which stays readable once unlinked.
+        snapshots_dir = os.path.join(path, SNAPSHOTS_DIR)
+        for old in os.listdir(snapshots_dir):
+            if old != snapshot:
+                shutil.rmtree(os.path.join(snapshots_dir, old), ignore_errors=True)
+
+    @classmethod
+    def load(
+        cls, path: str, embedding: Embeddings, embedding_id: str | None = None
+    ) -> "MatrixVectorStore":
+        """Open a store written by ``save``, memory-mapping the matrix.
+
+        Raises ``EmbeddingMismatchError`` when ``embedding_id`` is given and
+        the store was saved with another one, or without one.
+        """
+        manifest = _read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No vector store in {path}")
+        saved_id = manifest.get("embedding_id")
+        if embedding_id is not None and saved_id != embedding_id:
+            raise EmbeddingMismatchError(
+                f"Vector store {path} was built with {saved_id or 'unknown'} "
+                f"embeddings, not {embedding_id}"
+            )
+
+        store = cls(embedding=embedding, embedding_id=saved_id)
+        snapshot_path = manifest["dir"]
+        matrix = np.load(os.path.join(snapshot_path, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(snapshot_path, DOCSTORE_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+
+        store._docs = [Document(**r) for r in records]
+        store._ids = [r["id"] for r in records]
+        store._rows = {doc_id: row for row, doc_id in enumerate(store._ids)}
+        store._size = len(records)
+        if store._size:
+            # Read-only until the first write, see _writable().
+            store._matrix = matrix
+            store._capacity = matrix.shape[0]
+        return store
+
+    @classmethod
+    def load_or_create(
+        cls, path: str, embedding: Embeddings, embedding_id: str | None = None
+    ) -> "MatrixVectorStore":
+        """``load``, or an empty store when ``path`` has no manifest.
+
+        A manifest whose snapshot is missing raises ``FileNotFoundError``
+        rather than starting over with an empty store, and a store saved with
+        other embeddings raises ``EmbeddingMismatchError``.
+        """
+        if _read_manifest(path) is None:
+            return cls(embedding=embedding, embedding_id=embedding_id)
+        return cls.load(path, embedding, embedding_id)
+
+    def _reserve(self, size: int, dim: int) -> None:
+        if (
+            self._matrix is not None
+            and size <= self._capacity
+            and self._matrix.flags.writeable
+        ):
+            return
+        capacity = max(self._capacity, 1)
+        while capacity < size:
+            capacity *= 2
+        matrix = np.empty((capacity, dim), dtype=np.float32)
+        if self._size:
+            matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        self._capacity = capacity
+
+    def _writable(self) -> np.ndarray:
+        if self._matrix is not None and not self._matrix.flags.writeable:
+            # Copy the memory-mapped matrix out before the first change.
+            self._reserve(self._size, self._matrix.shape[1])
+        return self._matrix
+
+
+def _read_manifest(path: str) -> dict | None:
+    """The manifest of the current save, with its directory as ``dir``.
+
+    None when nothing was saved to ``path``.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    manifest["dir"] = os.path.join(path, SNAPSHOTS_DIR, manifest["snapshot"])
+    return manifest
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
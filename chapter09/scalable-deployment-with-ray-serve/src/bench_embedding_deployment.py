@@ -0,0 +1,244 @@
+"""Shared EmbeddingDeployment vs an embedding model in every replica and task.
+
+Serving, on a FAISS index of the repository's READMEs:
+- colocated: ``--search-replicas`` search replicas that each load the model
+  and embed their own queries (what SearchDeployment used to do).
+- shared: as many search replicas holding only the index, embedding queries
+  through ``--embedding-replicas`` EmbeddingDeployment replicas, which batch
+  the queries of all search replicas together.
+
+Each design answers ``--queries`` searches sent ``--concurrency`` at a time;
+reported are queries/s, latency p50/p95 and the summed RSS of the replica
+processes. Bulk embedding then embeds the corpus ``--copies`` times in
+batches of ``--batch-size``, with a task per batch that loads the model
+(build_index's ``embed_chunks_with_progress``) vs on the shared deployment,
+``--max-in-flight`` batches at a time, while queries keep arriving; their
+latency is reported next to that of queries on the idle deployment.
+
+Run:
+> uv run src/bench_embedding_deployment.py --search-replicas 4 --embedding-replicas 1
+"""
+
+import argparse
+import asyncio
+import pathlib
+import statistics
+import tempfile
+import time
+
+import ray
+from embedder import (
+    MODEL_NAME,
+    DeploymentEmbeddings,
+    EmbeddingDeployment,
+    embed_batches,
+)
+from langchain_community.vectorstores import FAISS
+from ray import serve
+from ray.serve.handle import DeploymentHandle
+from ray.util.state import list_actors
+from utils import RecursiveTextSplitter
+
+REPO = pathlib.Path(__file__).resolve().parents[3]
+
+QUERIES = [
+    "How can Ray help with deploying LLMs?",
+    "How do I build the FAISS index?",
+    "How is the vector store persisted?",
+    "How do I stream tokens over a WebSocket?",
+    "What does the admission control do when the queue is full?",
+    "How do I run the MCP math server over HTTP?",
+    "How are LLM responses cached?",
+    "How do I enable tracing?",
+]
+
+
+def corpus() -> list[str]:
+    splitter = RecursiveTextSplitter(chunk_size=500, chunk_overlap=50)
+    texts = [p.read_text(encoding="utf-8") for p in sorted(REPO.glob("**/README.md"))]
+    return [chunk for text in texts for chunk in splitter.split_text(text)]
+
+
+@serve.deployment
+class ColocatedSearch:
+    def __init__(self, index_dir: str, model_name: str):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        self.index = FAISS.load_local(
+            index_dir, embeddings, allow_dangerous_deserialization=True
+        )
+
+    async def __call__(self, query: str) -> list:
+        return self.index.similarity_search_with_score(query, k=5)
+
+
+@serve.deployment
+class SharedSearch:
+    def __init__(self, index_dir: str, embedder: DeploymentHandle):
+        self.index = FAISS.load_local(
+            index_dir,
+            DeploymentEmbeddings(embedder),
+            allow_dangerous_deserialization=True,
+        )
+
+    async def __call__(self, query: str) -> list:
+        return await self.index.asimilarity_search_with_score(query, k=5)
+
+
+@ray.remote
+def embed_batch(texts: list[str], model_name: str) -> int:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return len(HuggingFaceEmbeddings(model_name=model_name).embed_documents(texts))
+
+
+def replica_rss_mb(app_name: str) -> dict[str, float]:
+    """Summed RSS of each deployment's replicas in ``app_name``."""
+    rss: dict[str, float] = {}
+    for actor in list_actors(filters=[("state", "=", "ALIVE")]):
+        prefix, _, deployment = actor.class_name.rpartition(":")
+        if prefix != f"ServeReplica:{app_name}":
+            continue
+        status = pathlib.Path(f"/proc/{actor.pid}/status").read_text()
+        kb = next(line for line in status.splitlines() if line.startswith("VmRSS"))
+        rss[deployment] = rss.get(deployment, 0.0) + int(kb.split()[1]) / 1024
+    return rss
+
+
+async def load(handle: DeploymentHandle, queries: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+
+    async def worker(offset: int) -> None:
+        for i in range(offset, queries, concurrency):
+            started = time.perf_counter()
+            results = await handle.remote(QUERIES[i % len(QUERIES)])
+            latencies.append(time.perf_counter() - started)
+            assert len(results) == 5
+
+    # Warm every replica up before timing.
+    await asyncio.gather(*(handle.remote(q) for q in QUERIES * 4))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "qps": queries / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def serving(args: argparse.Namespace, index_dir: str, embedder) -> None:
+    designs = {
+        "colocated": ColocatedSearch.options(num_replicas=args.search_replicas).bind(
+            index_dir, args.model
+        ),
+        "shared": SharedSearch.options(num_replicas=args.search_replicas).bind(
+            index_dir, embedder
+        ),
+    }
+    print(
+        f"{args.queries} queries at concurrency {args.concurrency}, "
+        f"{args.search_replicas} search replicas, "
+        f"{args.embedding_replicas} embedding replicas (shared)"
+    )
+    for name, app in designs.items():
+        handle = serve.run(app, name=name, route_prefix=None)
+        stats = asyncio.run(load(handle, args.queries, args.concurrency))
+        rss = replica_rss_mb(name)
+        if name == "shared":
+            rss.update(replica_rss_mb("embeddings"))
+        serve.delete(name)
+        memory = "  ".join(f"{k} {v:.0f} MB" for k, v in rss.items())
+        print(
+            f"{name:<10} {stats['qps']:7.1f} q/s  p50 {stats['p50_ms']:7.1f} ms  "
+            f"p95 {stats['p95_ms']:7.1f} ms  RSS {sum(rss.values()):.0f} MB "
+            f"({memory})"
+        )
+
+
+async def query_latencies(embedder: DeploymentHandle, until) -> list[float]:
+    """Latencies of queries embedded back to back, 4 at a time, until ``until()``."""
+    latencies: list[float] = []
+
+    async def worker(offset: int) -> None:
+        i = offset
+        while not until():
+            started = time.perf_counter()
+            await embedder.embed_query.remote(QUERIES[i % len(QUERIES)])
+            latencies.append(time.perf_counter() - started)
+            i += 4
+
+    await asyncio.gather(*(worker(i) for i in range(4)))
+    return latencies
+
+
+def latency_ms(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return f"p50 {p50 * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms"
+
+
+def bulk(args: argparse.Namespace, chunks: list[str], embedder) -> None:
+    texts = chunks * args.copies
+    batches = [
+        texts[i : i + args.batch_size] for i in range(0, len(texts), args.batch_size)
+    ]
+    print(f"{len(texts)} chunks in {len(batches)} batches of {args.batch_size}")
+
+    started = time.perf_counter()
+    assert sum(
+        ray.get([embed_batch.remote(b, args.model) for b in batches])
+    ) == len(texts)
+    seconds = time.perf_counter() - started
+    print(f"tasks      {len(texts) / seconds:7.1f} chunks/s (a model load per batch)")
+
+    def embed_all() -> int:
+        vectors = embed_batches(embedder, batches, args.max_in_flight)
+        return sum(len(v) for v in vectors)
+
+    async def embed_under_queries() -> tuple[float, list[float], list[float]]:
+        stop = time.perf_counter() + 5
+        idle = await query_latencies(embedder, lambda: time.perf_counter() > stop)
+        started = time.perf_counter()
+        embedding = asyncio.create_task(asyncio.to_thread(embed_all))
+        busy = await query_latencies(embedder, embedding.done)
+        assert await embedding == len(texts)
+        return time.perf_counter() - started, idle, busy
+
+    seconds, idle, busy = asyncio.run(embed_under_queries())
+    print(
+        f"deployment {len(texts) / seconds:7.1f} chunks/s "
+        f"({args.max_in_flight} batches in flight)"
+    )
+    print(f"queries, idle deployment  {latency_ms(idle)}")
+    print(f"queries, during bulk      {latency_ms(busy)}")
+
+
+def main(args: argparse.Namespace) -> None:
+    ray.init()
+    app = EmbeddingDeployment.options(num_replicas=args.embedding_replicas).bind(
+        args.model
+    )
+    embedder = serve.run(app, name="embeddings", route_prefix=None)
+    chunks = corpus()
+    with tempfile.TemporaryDirectory() as index_dir:
+        FAISS.from_texts(chunks, DeploymentEmbeddings(embedder)).save_local(index_dir)
+        serving(args, index_dir, embedder)
+    bulk(args, chunks, embedder)
+    serve.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--search-replicas", type=int, default=4)
+    parser.add_argument("--embedding-replicas", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--copies", type=int, default=50, help="corpus copies (bulk)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--model", default=MODEL_NAME)
+    main(parser.parse_args())
@@ -0,0 +1,194 @@
+"""Search latency while a new index version rolls out, under load.
+
+Publishes an index version of ``--vectors`` random vectors as build_index
+does, serves it with ``--search-replicas`` SearchDeployment replicas and
+keeps ``--concurrency`` searches in flight for ``--duration`` seconds.
+Halfway through, a second version rolls out:
+
+- swap: it is published to the same index directory, and the replicas load
+  and warm it up in the background, then swap it in.
+- restart: the deployment is redeployed on it, which replaces the replicas
+  (what picking up a rebuilt index took before).
+
+Every response carries the version it came from. Reported are latency per
+``--bucket`` seconds, and p50/p99 before the rollout, during it (until the
+last response from the old version) and after, plus failed requests.
+
+Run:
+> uv run src/bench_index_reload.py --vectors 200000 --search-replicas 2 --mode swap
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import ray
+from embedder import DeploymentEmbeddings, get_embedder
+from index_store import new_version, publish
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from metadata_index import MetadataIndex
+from ray import serve
+from ray.serve.handle import DeploymentHandle
+from serve_index import WARMUP_QUERIES, SearchDeployment
+
+BASE_URL = "https://docs.example.com/docs"
+
+QUERIES = [
+    "How can Ray help with deploying LLMs?",
+    "How do I build the FAISS index?",
+    "What is retrieval augmented generation?",
+    "How do I scale a deployment?",
+]
+
+
+def save_random_index(index_dir: str, n: int, dim: int, seed: int) -> str:
+    """Save a version of ``n`` random vectors under ``index_dir``; its name."""
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.standard_normal((n, dim), dtype=np.float32))
+    sources = sorted(f"{BASE_URL}/section-{i % 10}/page-{i // 200}" for i in range(n))
+    docs = {
+        str(i): Document(f"chunk {i} of version {seed}", metadata={"source": source})
+        for i, source in enumerate(sources)
+    }
+    store = FAISS(
+        FakeEmbeddings(size=dim),
+        index,
+        InMemoryDocstore(docs),
+        {i: str(i) for i in range(n)},
+    )
+    version, path = new_version(index_dir)
+    store.save_local(path)
+    MetadataIndex.build(BASE_URL, sources).save(path)
+    return version
+
+
+async def load(handle, args: argparse.Namespace, rollout) -> list[tuple]:
+    """(start, end, version or None on failure) of every request."""
+    records: list[tuple] = []
+    stop = time.perf_counter() + args.duration
+
+    async def worker(offset: int) -> None:
+        i = offset
+        while time.perf_counter() < stop:
+            query = QUERIES[i % len(QUERIES)]
+            i += args.concurrency
+            request = SimpleNamespace(query_params={"query": query})
+            started = time.perf_counter()
+            try:
+                response = await handle.remote(request)
+                ok = response["status"] == "success"
+                version = response.get("index_version") if ok else None
+            except Exception:
+                version = None
+            records.append((started, time.perf_counter(), version))
+
+    async def roll_out() -> None:
+        await asyncio.sleep(args.duration / 2)
+        records.append((time.perf_counter(), None, "rollout"))
+        await asyncio.to_thread(rollout)
+
+    await asyncio.gather(roll_out(), *(worker(i) for i in range(args.concurrency)))
+    return records
+
+
+def percentiles(latencies: list[float]) -> str:
+    if not latencies:
+        return "no requests"
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    return (
+        f"{len(latencies):6d} req  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p99 {p99 * 1000:7.1f} ms"
+    )
+
+
+def report(records: list[tuple], old: str, new: str, bucket: float) -> None:
+    rollout = next(start for start, end, version in records if version == "rollout")
+    requests = [r for r in records if r[1] is not None]
+    first = min(start for start, _, _ in requests)
+    last_old = max((end for _, end, v in requests if v == old), default=rollout)
+    first_new = min((end for _, end, v in requests if v == new), default=float("nan"))
+    failed = sum(v is None for _, _, v in requests)
+
+    print(f"{'t (s)':>7}  latency (rollout at {rollout - first:.1f}s)")
+    names = {old: "old", new: "new", None: "failed"}
+    buckets: dict[int, list] = {}
+    for start, end, version in requests:
+        buckets.setdefault(int((end - first) // bucket), []).append(
+            (end - start, names[version])
+        )
+    for b in sorted(buckets):
+        rows = buckets[b]
+        versions = "+".join(sorted({name for _, name in rows}))
+        print(f"{b * bucket:7.1f}  {percentiles([l for l, _ in rows])}  {versions}")
+
+    windows = {
+        "before": [e - s for s, e, _ in requests if e < rollout],
+        "during": [e - s for s, e, _ in requests if rollout <= e <= last_old],
+        "after": [e - s for s, e, _ in requests if e > last_old],
+    }
+    for name, latencies in windows.items():
+        print(f"{name:<7} {percentiles(latencies)}")
+    print(
+        f"new version first served {first_new - rollout:.1f}s after the rollout, "
+        f"old version last served {last_old - rollout:.1f}s after; "
+        f"{failed} failed requests"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    ray.init()
+    embedder = get_embedder()
+    dim = len(DeploymentEmbeddings(embedder).embed_query("dimension"))
+    # Replicas only watch the index for new versions in swap mode.
+    poll_interval = args.poll_interval if args.mode == "swap" else None
+    with tempfile.TemporaryDirectory() as index_dir:
+        old = save_random_index(index_dir, args.vectors, dim, seed=1)
+        publish(index_dir, old, warmup_queries=WARMUP_QUERIES)
+        # Saved up front so that only the rollout itself is timed.
+        new = save_random_index(index_dir, args.vectors, dim, seed=2)
+
+        def deploy(version: str) -> DeploymentHandle:
+            # A different env var makes Serve replace the replicas.
+            options = {"runtime_env": {"env_vars": {"INDEX_VERSION": version}}}
+            deployment = SearchDeployment.options(
+                num_replicas=args.search_replicas, ray_actor_options=options
+            )
+            app = deployment.bind(embedder, index_dir, poll_interval)
+            return serve.run(app, name="search", route_prefix=None)
+
+        def rollout() -> None:
+            # What build_index does once the new version is saved.
+            publish(index_dir, new, warmup_queries=WARMUP_QUERIES)
+            if args.mode == "restart":
+                deploy(new)
+
+        handle = deploy(old)
+        print(
+            f"{args.mode}: {args.vectors} vectors per version, "
+            f"{args.search_replicas} search replicas, {args.concurrency} in flight"
+        )
+        records = asyncio.run(load(handle, args, rollout))
+        report(records, old, new, args.bucket)
+        serve.delete("search")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=["swap", "restart"], default="swap")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--search-replicas", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--bucket", type=float, default=2.0, help="seconds per row")
+    main(parser.parse_args())
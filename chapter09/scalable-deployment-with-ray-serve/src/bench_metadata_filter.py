@@ -0,0 +1,142 @@
+"""Filtered search: id selector from the metadata index vs post-filtering.
+
+Builds a FAISS index of ``--vectors`` random vectors whose chunks belong to
+pages under sections of different sizes, ordered by source as build_index
+does, and searches each section (``--queries`` random queries, k=5):
+
+- post-filter: LangChain's ``filter=`` on the source, which over-fetches
+  ``fetch_k`` results and drops the non-matching ones in Python.
+- selector: ``search_with_selector`` with the metadata index's id selector,
+  applied inside the FAISS scan.
+
+Completeness is the share of the exact top-k within the section that was
+returned. No embedding model is needed.
+
+Run:
+> uv run src/bench_metadata_filter.py --vectors 100000 --fetch-k 20 200
+"""
+
+import argparse
+import statistics
+import time
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from metadata_index import MetadataIndex, search_with_selector
+
+BASE_URL = "https://docs.example.com/docs"
+# Section name -> share of the chunks; the rest go to "other".
+SECTIONS = {"half": 0.5, "tenth": 0.1, "percent": 0.01, "permille": 0.001}
+CHUNKS_PER_PAGE = 20
+
+
+def sources(n: int) -> list[str]:
+    """Source of every chunk, sorted."""
+    sizes = {name: max(1, int(n * share)) for name, share in SECTIONS.items()}
+    sizes["other"] = n - sum(sizes.values())
+    result = []
+    for name, size in sizes.items():
+        result += [
+            f"{BASE_URL}/{name}/page-{i // CHUNKS_PER_PAGE:05d}" for i in range(size)
+        ]
+    return sorted(result)
+
+
+def build(n: int, dim: int) -> tuple[FAISS, np.ndarray, list[str]]:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    chunk_sources = sources(n)
+    docs = {
+        str(i): Document(f"chunk {i}", metadata={"source": source})
+        for i, source in enumerate(chunk_sources)
+    }
+    store = FAISS(
+        FakeEmbeddings(size=dim),
+        index,
+        InMemoryDocstore(docs),
+        {i: str(i) for i in range(n)},
+    )
+    return store, vectors, chunk_sources
+
+
+def exact_top_k(vectors: np.ndarray, ids: np.ndarray, query: np.ndarray, k: int):
+    distances = ((vectors[ids] - query) ** 2).sum(axis=1)
+    return set(ids[np.argsort(distances)[:k]].tolist())
+
+
+def measure(search, queries, expected, k: int) -> tuple[float, float]:
+    """Median latency in ms and completeness of ``search``."""
+    latencies, found = [], 0
+    for query, exact in zip(queries, expected):
+        started = time.perf_counter()
+        results = search(query)
+        latencies.append(time.perf_counter() - started)
+        found += len(exact & {int(doc.page_content.split()[1]) for doc, _ in results})
+    return statistics.median(latencies) * 1000, found / (k * len(queries))
+
+
+def main(args: argparse.Namespace) -> None:
+    faiss.omp_set_num_threads(1)
+    store, vectors, chunk_sources = build(args.vectors, args.dim)
+    started = time.perf_counter()
+    metadata_index = MetadataIndex.build(BASE_URL, chunk_sources)
+    print(
+        f"{args.vectors} vectors, metadata index built in "
+        f"{(time.perf_counter() - started) * 1000:.0f} ms "
+        f"({len(metadata_index.sources)} sources, "
+        f"{len(metadata_index.sections)} sections)"
+    )
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    k = 5
+
+    unfiltered, _ = measure(
+        lambda q: search_with_selector(store, q.tolist(), k),
+        queries,
+        [set()] * len(queries),
+        k,
+    )
+    print(f"unfiltered {unfiltered:7.2f} ms")
+    for section, share in SECTIONS.items():
+        ranges = metadata_index.ranges(section=section)
+        ids = np.concatenate([np.arange(s, e) for s, e in ranges])
+        expected = [exact_top_k(vectors, ids, q, k) for q in queries]
+        prefix = f"{BASE_URL}/{section}/"
+        print(f"section '{section}': {share:.1%} of chunks")
+
+        for fetch_k in args.fetch_k:
+            latency, complete = measure(
+                lambda q: store.similarity_search_with_score_by_vector(
+                    q.tolist(),
+                    k,
+                    filter=lambda md: md["source"].startswith(prefix),
+                    fetch_k=fetch_k,
+                ),
+                queries,
+                expected,
+                k,
+            )
+            label = f"post-filter fetch_k={fetch_k}"
+            print(f"  {label:<26} {latency:7.2f} ms  complete {complete:6.1%}")
+
+        def select(q, section=section):
+            selector = metadata_index.selector(section=section)
+            return search_with_selector(store, q.tolist(), k, selector)
+
+        latency, complete = measure(select, queries, expected, k)
+        print(f"  {'selector':<26} {latency:7.2f} ms  complete {complete:6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 200])
+    main(parser.parse_args())
@@ -4,7 +4,10 @@ This module provides functionality to build a FAISS vector index from documentat
 websites using Ray for parallel processing. It includes preprocessing, embedding,
 and checkpointing capabilities for efficient index creation.
 
-To force a rebuild: Delete the faiss_index directory.
+Each build is saved as a new version under faiss_index/versions/ and made
+current through faiss_index/manifest.json (see index_store.py); running
+SearchDeployment replicas pick it up without a restart. To force a rebuild,
+crawling again: REBUILD_INDEX=1, or build_index(..., rebuild=True).
 
 Example:
     Basic usage:
@@ -21,9 +24,12 @@ import ray
 from langchain_community.document_loaders import RecursiveUrlLoader
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
+from embedder import DeploymentEmbeddings, embed_batches, get_embedder
+from index_store import new_version, publish, read_manifest, version_dir
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from metadata_index import METADATA_INDEX_FILE, MetadataIndex
 from tools import clean_html_content
+from utils import RecursiveTextSplitter
 
 # Initialize Ray
 ray.init(include_dashboard=True, dashboard_host="0.0.0.0")
@@ -44,7 +50,7 @@ def preprocess_documents(
         List of document chunks.
     """
     print(f"Preprocessing batch of {len(docs)} documents")
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = RecursiveTextSplitter(
         chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
     chunks = text_splitter.split_documents(docs)
@@ -75,6 +81,39 @@ def embed_chunks_with_progress(
     return result
 
 
+def embed_chunks_with_deployment(
+    chunk_batches: list[list[Document]],
+    embeddings: DeploymentEmbeddings,
+    max_in_flight: int = 4,
+) -> FAISS:
+    """Embed chunk batches on the shared EmbeddingDeployment.
+
+    Batches are spread over the deployment's replicas, none of which has to
+    load the model for this build. Only ``max_in_flight`` are sent at a
+    time, and the deployment puts search queries ahead of them, so a build
+    can run next to live search traffic.
+
+    Args:
+        chunk_batches: Batches of document chunks to embed.
+        embeddings: Embeddings backed by the EmbeddingDeployment handle.
+        max_in_flight: Batches sent to the deployment at a time.
+
+    Returns:
+        FAISS index containing the embedded chunks.
+    """
+    vectors_per_batch = embed_batches(
+        embeddings.handle,
+        ([c.page_content for c in batch] for batch in chunk_batches),
+        max_in_flight,
+    )
+    text_embeddings, metadatas = [], []
+    for i, (batch, vectors) in enumerate(zip(chunk_batches, vectors_per_batch)):
+        text_embeddings.extend(zip((c.page_content for c in batch), vectors))
+        metadatas.extend(c.metadata for c in batch)
+        print(f"Completed {i+1}/{len(chunk_batches)} embedding batches")
+    return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+
+
 def build_index(
     base_url: str,
     batch_size: int = 10,
@@ -83,12 +122,16 @@ def build_index(
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
     index_dir: str = "faiss_index",
     checkpoint_dir: str = "embedding_checkpoints",
+    embedding_deployment: bool = False,
+    rebuild: bool = False,
+    warmup_queries: list[str] | None = None,
 ) -> FAISS:
     """Build and save a FAISS index from documentation website.
 
     This function loads documentation from a website, preprocesses it into chunks,
-    embeds the chunks using a specified model, and saves the resulting FAISS index.
-    Includes checkpointing to resume from interruptions.
+    embeds the chunks using a specified model, and saves the resulting FAISS index
+    together with a metadata index of the source URLs and sections (see
+    metadata_index.py). Includes checkpointing to resume from interruptions.
 
     Args:
         base_url: Base URL to scrape documentation from. Defaults to LangChain tutorials.
@@ -99,6 +142,13 @@ def build_index(
         model_name: HuggingFace model name for embeddings.
         index_dir: Directory to save the final FAISS index.
         checkpoint_dir: Directory to save intermediate checkpoints.
+        embedding_deployment: Embed on the shared EmbeddingDeployment (the
+                 running "embeddings" Serve application, deployed if missing)
+                 instead of in tasks that each load the model.
+        rebuild: Crawl and embed again into a new index version even if the
+                 chunks are cached and an index exists.
+        warmup_queries: Queries SearchDeployment replicas run on the new
+                 version before swapping it in; stored in the manifest.
 
     Returns:
         The constructed FAISS index.
@@ -123,7 +173,7 @@ def build_index(
 
     # Check for cached chunks first
     chunks_file = os.path.join(checkpoint_dir, "chunks.pkl")
-    if os.path.exists(chunks_file):
+    if os.path.exists(chunks_file) and not rebuild:
         print("Loading cached chunks...")
         with open(chunks_file, "rb") as f:
             all_chunks = pickle.load(f)
@@ -153,18 +203,29 @@ def build_index(
             pickle.dump(all_chunks, f)
 
     # Check if FAISS index already exists
-    index_file = os.path.join(index_dir, "index.faiss")
-    if os.path.exists(index_file):
-        print(f"Loading existing FAISS index from '{index_dir}'...")
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    manifest = read_manifest(index_dir)
+    if manifest is not None and not rebuild:
+        current_dir = version_dir(index_dir, manifest)
+        print(f"Loading existing FAISS index version {manifest['version']}...")
+        if embedding_deployment:
+            embeddings = DeploymentEmbeddings(get_embedder(model_name=model_name))
+        else:
+            embeddings = HuggingFaceEmbeddings(model_name=model_name)
         index = FAISS.load_local(
-            index_dir, embeddings, allow_dangerous_deserialization=True
+            current_dir, embeddings, allow_dangerous_deserialization=True
         )
         print(f"Loaded existing index with {index.index.ntotal} vectors")
+        if not os.path.exists(os.path.join(current_dir, METADATA_INDEX_FILE)):
+            print("Building metadata index...")
+            MetadataIndex.from_faiss(index, base_url).save(current_dir)
         return index
 
     print("No existing index found, proceeding with embedding...")
 
+    # Give each source, and so each URL prefix, a contiguous run of FAISS ids
+    # for the metadata index. The sort is stable: chunks stay in page order.
+    all_chunks.sort(key=lambda chunk: chunk.metadata.get("source", ""))
+
     # Split into embedding batches
     chunk_batches = []
     for i in range(0, len(all_chunks), embedding_batch_size):
@@ -173,28 +234,47 @@ def build_index(
     print(
         f"Starting parallel embedding with {len(chunk_batches)} batches of ~{embedding_batch_size} chunks each..."
     )
-    index_futures = [
-        embed_chunks_with_progress.remote(batch, i, model_name)
-        for i, batch in enumerate(chunk_batches)
-    ]
-
-    # Get results with progress tracking
-    indices = []
-    for i, future in enumerate(index_futures):
-        result = ray.get(future)
-        indices.append(result)
-        print(f"Completed {i+1}/{len(index_futures)} embedding batches")
-
-    # Merge indices
-    print("Merging indices...")
-    index = indices[0]
-    for idx in indices[1:]:
-        index.merge_from(idx)
-
-    # Save the index
-    print(f"Saving index to '{index_dir}'...")
-    index.save_local(index_dir)
+    if embedding_deployment:
+        embeddings = DeploymentEmbeddings(get_embedder(model_name=model_name))
+        index = embed_chunks_with_deployment(chunk_batches, embeddings)
+    else:
+        index_futures = [
+            embed_chunks_with_progress.remote(batch, i, model_name)
+            for i, batch in enumerate(chunk_batches)
+        ]
+
+        # Get results with progress tracking
+        indices = []
+        for i, future in enumerate(index_futures):
+            result = ray.get(future)
+            indices.append(result)
+            print(f"Completed {i+1}/{len(index_futures)} embedding batches")
+
+        # Merge indices
+        print("Merging indices...")
+        index = indices[0]
+        for idx in indices[1:]:
+            index.merge_from(idx)
+
+    # Save the index as a new version, then make it current
+    version, path = new_version(index_dir)
+    print(f"Saving index version {version} to '{path}'...")
+    index.save_local(path)
+    metadata_index = MetadataIndex.from_faiss(index, base_url)
+    metadata_index.save(path)
+    publish(
+        index_dir,
+        version,
+        vectors=index.index.ntotal,
+        model_name=model_name,
+        base_url=base_url,
+        warmup_queries=warmup_queries or [],
+    )
     print(f"Index saved successfully! Contains {index.index.ntotal} vectors")
+    print(
+        f"Metadata index: {len(metadata_index.sources)} sources, "
+        f"{len(metadata_index.sections)} sections"
+    )
 
     return index
 
@@ -202,12 +282,23 @@ def build_index(
 if __name__ == "__main__":
     """Main execution block with example usage patterns."""
 
+    test_queries = [
+        "How can I build a chatbot with LangChain?",
+        "What is retrieval augmented generation?",
+        "How do I use document loaders?",
+    ]
+
     # Example 1: LangChain tutorials (smaller, faster - recommended for testing)
     print("Building index from LangChain tutorials...")
     index = build_index(
         base_url="https://docs.langchain.com/oss/python/learn",
         batch_size=10,
         max_depth=2,
+        # EMBEDDING_DEPLOYMENT=1 embeds on the shared EmbeddingDeployment
+        embedding_deployment=os.getenv("EMBEDDING_DEPLOYMENT") == "1",
+        # REBUILD_INDEX=1 publishes a new version even if one exists
+        rebuild=os.getenv("REBUILD_INDEX") == "1",
+        warmup_queries=test_queries,
     )
 
     # Example 2: LangGraph documentation (alternative)
@@ -227,12 +318,6 @@ if __name__ == "__main__":
 
     # Test the index with a sample query
     print("\nTesting the index:")
-    test_queries = [
-        "How can I build a chatbot with LangChain?",
-        "What is retrieval augmented generation?",
-        "How do I use document loaders?",
-    ]
-
     for query in test_queries:
         print(f"\nQuery: {query}")
         results = index.similarity_search(query, k=2)
@@ -0,0 +1,177 @@
+"""Shared embedding deployment.
+
+One ``EmbeddingDeployment`` holds the sentence-transformers model for every
+caller: ``SearchDeployment`` replicas embed queries through it, and
+``build_index`` can send it chunks for bulk embedding. Queries arriving from
+different callers within a few milliseconds are encoded together in one
+forward pass, and embedding replicas scale independently of index replicas.
+
+Queries come first: they have a thread of their own, so they never queue
+behind bulk requests, which are encoded in passes of ``BULK_PASS_SIZE``
+texts on another thread, each started only while no query is in progress.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from ray import serve
+from ray.serve.exceptions import RayServeException
+from ray.serve.handle import DeploymentHandle
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Serve application that build_index looks for, and deploys if it's missing.
+APP_NAME = "embeddings"
+DEPLOYMENT_NAME = "EmbeddingDeployment"
+
+# Texts per forward pass of a bulk request.
+BULK_PASS_SIZE = 32
+
+
+@serve.deployment(
+    # Serve's default of 5 would cap the queries one replica can batch.
+    max_ongoing_requests=128,
+    ray_actor_options={"num_cpus": 1},
+)
+class EmbeddingDeployment:
+    def __init__(self, model_name: str = MODEL_NAME):
+        # Imported here so that callers holding a handle never load torch.
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        print(f"Loading embedding model {model_name}...")
+        self._model_name = model_name
+        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        # Forward passes run off the event loop so that requests keep
+        # queueing up meanwhile; one query pass and one bulk pass at a time
+        # (torch already uses every core for each).
+        self._query_executor = ThreadPoolExecutor(max_workers=1)
+        self._bulk_executor = ThreadPoolExecutor(max_workers=1)
+        # Query batches in progress; bulk passes only start when there are
+        # none, one at a time.
+        self._queries = 0
+        self._no_queries = asyncio.Event()
+        self._no_queries.set()
+        self._bulk_pass = asyncio.Lock()
+
+    def model_name(self) -> str:
+        """The model the vectors come from; callers check it matches theirs."""
+        return self._model_name
+
+    async def _encode(
+        self, texts: list[str], executor: ThreadPoolExecutor
+    ) -> np.ndarray:
+        vectors = await asyncio.get_running_loop().run_in_executor(
+            executor, self.embeddings.embed_documents, texts
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Embed a batch of chunks; one row per text.
+
+        Encoded in passes of ``BULK_PASS_SIZE`` that give way to queries.
+        """
+        passes = []
+        for start in range(0, len(texts), BULK_PASS_SIZE):
+            async with self._bulk_pass:
+                await self._no_queries.wait()
+                batch = texts[start : start + BULK_PASS_SIZE]
+                passes.append(await self._encode(batch, self._bulk_executor))
+        if not passes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(passes)
+
+    @serve.batch(max_batch_size=64, batch_wait_timeout_s=0.005)
+    async def embed_query(self, queries: list[str]) -> list[np.ndarray]:
+        """Embed one query; concurrent calls are encoded as one batch."""
+        self._queries += 1
+        self._no_queries.clear()
+        try:
+            return list(await self._encode(queries, self._query_executor))
+        finally:
+            self._queries -= 1
+            if not self._queries:
+                self._no_queries.set()
+
+
+class DeploymentEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` backed by an ``EmbeddingDeployment`` handle.
+
+    The sync methods block on the handle and are meant for drivers such as
+    ``build_index``; inside a deployment use the async ones.
+    """
+
+    def __init__(self, handle: DeploymentHandle):
+        self.handle = handle
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.handle.embed_documents.remote(texts).result().tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.handle.embed_query.remote(text).result().tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return (await self.handle.embed_documents.remote(texts)).tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.handle.embed_query.remote(text)).tolist()
+
+
+def embed_batches(
+    handle: DeploymentHandle, batches: Iterable[list[str]], max_in_flight: int = 4
+) -> Iterator[np.ndarray]:
+    """Vectors of each batch, in order, with ``max_in_flight`` sent at a time.
+
+    Keeps bulk work from taking up every ``max_ongoing_requests`` slot of
+    the replicas, which queries need as well.
+    """
+    in_flight: deque = deque()
+    for texts in batches:
+        if len(in_flight) == max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(handle.embed_documents.remote(texts))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def get_embedder(
+    num_replicas: int | None = None, model_name: str = MODEL_NAME
+) -> DeploymentHandle:
+    """Handle to the running embeddings app, deploying it if there isn't one.
+
+    Args:
+        num_replicas: Replicas to run; a running app with another count is
+            rescaled. None keeps a running app as it is (one replica for a
+            new one).
+        model_name: The model the caller's vectors come from.
+
+    Raises:
+        ValueError: The running app serves another model, whose vectors
+            can't be mixed with ``model_name``'s.
+    """
+    try:
+        handle = serve.get_deployment_handle(DEPLOYMENT_NAME, app_name=APP_NAME)
+    except (RayServeException, KeyError):
+        # No Serve instance on this cluster yet, or no embeddings app on it.
+        print(f"No '{APP_NAME}' application running, deploying one...")
+    else:
+        running = handle.model_name.remote().result()
+        if running != model_name:
+            raise ValueError(
+                f"The '{APP_NAME}' application serves {running}, not {model_name}; "
+                f"delete it with serve.delete({APP_NAME!r}) to switch models"
+            )
+        if num_replicas is None or num_replicas == _running_replicas():
+            return handle
+        print(f"Scaling the '{APP_NAME}' application to {num_replicas} replicas...")
+    app = EmbeddingDeployment.options(num_replicas=num_replicas or 1).bind(model_name)
+    serve.run(app, name=APP_NAME, route_prefix=None)
+    return serve.get_deployment_handle(DEPLOYMENT_NAME, app_name=APP_NAME)
+
+
+def _running_replicas() -> int:
+    deployments = serve.status().applications[APP_NAME].deployments
+    return deployments[DEPLOYMENT_NAME].replica_states.get("RUNNING", 0)
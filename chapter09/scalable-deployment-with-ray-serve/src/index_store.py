@@ -0,0 +1,77 @@
+"""Versioned FAISS index directories.
+
+build_index writes each index to a fresh version directory and then points
+the manifest at it; SearchDeployment replicas poll the manifest and swap the
+new version in once it's loaded::
+
+    faiss_index/
+        manifest.json         {"version": ..., "path": "versions/..."}
+        versions/<version>/   index.faiss, index.pkl, metadata_index.json
+
+The manifest is replaced atomically, so readers see either the old or the
+new version, never a partly written one.
+"""
+
+import json
+import os
+import shutil
+import time
+
+MANIFEST_FILE = "manifest.json"
+VERSIONS_DIR = "versions"
+
+
+def new_version(index_dir: str) -> tuple[str, str]:
+    """Name and path of a new, empty version directory."""
+    version = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(index_dir, VERSIONS_DIR, version)
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(index_dir, VERSIONS_DIR, f"{version}-{suffix}")
+    os.makedirs(path)
+    return os.path.basename(path), path
+
+
+def publish(index_dir: str, version: str, keep: int = 3, **info) -> None:
+    """Make ``version`` current, then delete all but the newest ``keep``.
+
+    ``info`` (vector count, model, warmup queries, ...) goes into the
+    manifest as well.
+    """
+    manifest = {
+        "version": version,
+        "path": os.path.join(VERSIONS_DIR, version),
+        "created_at": time.time(),
+        **info,
+    }
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+    # Replicas hold loaded versions in memory, so only the files go.
+    versions = sorted(os.listdir(os.path.join(index_dir, VERSIONS_DIR)))
+    for old in versions[:-keep]:
+        if old != version:
+            shutil.rmtree(os.path.join(index_dir, VERSIONS_DIR, old))
+
+
+def read_manifest(index_dir: str) -> dict | None:
+    """The current version's manifest; None when there's no index at all.
+
+    An index saved straight into ``index_dir`` by an older build_index is
+    reported as version "unversioned".
+    """
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    if os.path.exists(os.path.join(index_dir, "index.faiss")):
+        return {"version": "unversioned", "path": ""}
+    return None
+
+
+def version_dir(index_dir: str, manifest: dict) -> str:
+    return os.path.join(index_dir, manifest["path"])
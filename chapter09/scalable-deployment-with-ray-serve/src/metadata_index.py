@@ -0,0 +1,189 @@
+"""Metadata index for filtering FAISS searches by source URL or section.
+
+``build_index`` orders chunks by source before embedding, so every source,
+and every source URL prefix, covers a contiguous run of FAISS ids. The
+index stores those runs: the sorted distinct sources with the id ranges of
+each, and the id ranges of each section (the first path segment of a source
+below the crawled base URL). A filter resolves to id ranges with a binary
+search and becomes a FAISS ``IDSelector``, which the search applies while
+scanning instead of over-fetching and filtering the results afterwards.
+"""
+
+import bisect
+import json
+import os
+from collections.abc import Iterable
+from urllib.parse import urlparse
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+METADATA_INDEX_FILE = "metadata_index.json"
+
+Ranges = list[tuple[int, int]]
+
+
+class MetadataIndex:
+    def __init__(
+        self,
+        base_url: str,
+        sources: list[str],
+        source_ranges: list[Ranges],
+        sections: dict[str, Ranges],
+    ):
+        """
+        Args:
+            base_url: The URL the index was crawled from.
+            sources: Distinct sources, sorted.
+            source_ranges: ``[start, end)`` FAISS id ranges of each source.
+            sections: ``[start, end)`` FAISS id ranges of each section.
+        """
+        self.base_url = base_url
+        self.sources = sources
+        self.source_ranges = source_ranges
+        self.sections = sections
+
+    @classmethod
+    def build(cls, base_url: str, sources: Iterable[str]) -> "MetadataIndex":
+        """Index the source of every FAISS id, given in id order."""
+        by_source: dict[str, list[list[int]]] = {}
+        by_section: dict[str, list[list[int]]] = {}
+        for i, source in enumerate(sources):
+            _extend(by_source.setdefault(source, []), i)
+            _extend(by_section.setdefault(section_of(base_url, source), []), i)
+        sources = sorted(by_source)
+        return cls(
+            base_url,
+            sources,
+            [_tuples(by_source[s]) for s in sources],
+            {k: _tuples(v) for k, v in by_section.items()},
+        )
+
+    @classmethod
+    def from_faiss(cls, index: FAISS, base_url: str) -> "MetadataIndex":
+        docs = (
+            index.docstore.search(index.index_to_docstore_id[i])
+            for i in range(index.index.ntotal)
+        )
+        return cls.build(base_url, (doc.metadata.get("source", "") for doc in docs))
+
+    def save(self, index_dir: str) -> None:
+        path = os.path.join(index_dir, METADATA_INDEX_FILE)
+        data = {
+            "base_url": self.base_url,
+            "sources": self.sources,
+            "source_ranges": self.source_ranges,
+            "sections": self.sections,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "MetadataIndex":
+        path = os.path.join(index_dir, METADATA_INDEX_FILE)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["base_url"],
+            data["sources"],
+            [_tuples(ranges) for ranges in data["source_ranges"]],
+            {k: _tuples(v) for k, v in data["sections"].items()},
+        )
+
+    def ranges(
+        self, source_prefix: str | None = None, section: str | None = None
+    ) -> Ranges | None:
+        """Sorted id ranges matching every given filter; None when unfiltered."""
+        result = None
+        if source_prefix is not None:
+            lo = bisect.bisect_left(self.sources, source_prefix)
+            hi = bisect.bisect_left(self.sources, source_prefix + "\U0010ffff")
+            result = _union(r for ranges in self.source_ranges[lo:hi] for r in ranges)
+        if section is not None:
+            ranges = self.sections.get(section, [])
+            result = ranges if result is None else _intersect(result, ranges)
+        return result
+
+    def selector(
+        self, source_prefix: str | None = None, section: str | None = None
+    ) -> faiss.IDSelector | None:
+        """FAISS selector for the given filters; None when unfiltered."""
+        ranges = self.ranges(source_prefix, section)
+        if ranges is None:
+            return None
+        if not ranges:
+            return faiss.IDSelectorRange(0, 0)
+        if len(ranges) == 1:
+            # Flat index ids are row numbers, so sorted: only [start, end)
+            # gets scanned.
+            start, end = ranges[0]
+            return faiss.IDSelectorRange(start, end, True)
+        ids = np.concatenate([np.arange(s, e, dtype=np.int64) for s, e in ranges])
+        return faiss.IDSelectorBatch(ids)
+
+
+def section_of(base_url: str, source: str) -> str:
+    """First path segment of ``source`` below ``base_url``; "" for the base."""
+    base = urlparse(base_url).path.rstrip("/")
+    path = urlparse(source).path
+    if path.startswith(base):
+        path = path[len(base) :]
+    return path.strip("/").split("/", 1)[0]
+
+
+def search_with_selector(
+    index: FAISS,
+    embedding: list[float],
+    k: int,
+    selector: faiss.IDSelector | None = None,
+) -> list[tuple[Document, float]]:
+    """``index.similarity_search_with_score_by_vector`` restricted to ``selector``."""
+    vector = np.asarray([embedding], dtype=np.float32)
+    if index._normalize_L2:
+        faiss.normalize_L2(vector)
+    params = None if selector is None else faiss.SearchParameters(sel=selector)
+    scores, ids = index.index.search(vector, k, params=params)
+    results = []
+    for i, score in zip(ids[0], scores[0]):
+        if i == -1:
+            # Fewer than k ids matched the selector.
+            continue
+        doc = index.docstore.search(index.index_to_docstore_id[i])
+        results.append((doc, float(score)))
+    return results
+
+
+def _extend(ranges: list[list[int]], i: int) -> None:
+    if ranges and ranges[-1][1] == i:
+        ranges[-1][1] = i + 1
+    else:
+        ranges.append([i, i + 1])
+
+
+def _union(ranges: Iterable[tuple[int, int]]) -> Ranges:
+    merged: list[list[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return _tuples(merged)
+
+
+def _tuples(ranges: Iterable[list[int]]) -> Ranges:
+    return [(start, end) for start, end in ranges]
+
+
+def _intersect(a: Ranges, b: Ranges) -> Ranges:
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
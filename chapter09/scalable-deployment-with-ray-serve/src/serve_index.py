@@ -1,51 +1,138 @@
-"""Ray Server with pre-built FAISS index."""
+"""Ray Server with pre-built FAISS index.
 
+SearchDeployment replicas watch the index manifest written by build_index.
+A new version is loaded and warmed up in the background, then swapped in
+atomically, so rebuilding the index needs no restart.
+
+Unpickling a version's documents holds the GIL for the whole load, which
+would stall a replica's event loop even from a worker thread. So each
+replica has an ``IndexLoader`` actor, at a lower CPU priority on the same
+node, that loads new versions and hands the documents over in small
+pickled pieces, which the replica unpickles one at a time between requests.
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
 import time
+import traceback
+from typing import NamedTuple
 
+import faiss
+import numpy as np
 import ray
+from embedder import MODEL_NAME, DeploymentEmbeddings, get_embedder
 from fastapi import FastAPI
+from index_store import read_manifest, version_dir
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from metadata_index import METADATA_INDEX_FILE, MetadataIndex, search_with_selector
 from ray import serve
-
-# Initialize Ray
-ray.init()
+from ray.serve.handle import DeploymentHandle
+from ray.util.scheduling_strategies import NodeAffinitySchedulingStrategy
 
 # Define our FastAPI app
 app = FastAPI()
 
+# Run on a new index version before it takes traffic, unless its manifest
+# lists warmup queries of its own.
+WARMUP_QUERIES = [
+    "How can I build a chatbot with LangChain?",
+    "What is retrieval augmented generation?",
+    "How do I use document loaders?",
+]
+
+
+# Added to the niceness of the process loading new versions, so that on a
+# busy node the replicas serving the current one get the CPU first.
+LOADER_NICENESS = 10
+# Documents per piece a replica unpickles before letting requests run.
+DOCS_PER_PIECE = 500
+
+
+class LoadedIndex(NamedTuple):
+    version: str
+    index: FAISS
+    metadata_index: MetadataIndex
+
+
+def load_version(path: str, embeddings: Embeddings) -> tuple[FAISS, MetadataIndex]:
+    """The FAISS index and metadata index of the version saved in ``path``."""
+    index = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    # Source URL and section filters resolve to FAISS id ranges here.
+    if os.path.exists(os.path.join(path, METADATA_INDEX_FILE)):
+        metadata_index = MetadataIndex.load(path)
+    else:
+        print("No metadata index found, building one (run build_index.py to")
+        print("persist it and to filter by section)...")
+        metadata_index = MetadataIndex.from_faiss(index, base_url="")
+    return index, metadata_index
+
+
+@ray.remote(num_cpus=0)
+class IndexLoader:
+    """Loads new index versions for a replica, in a process of its own."""
+
+    def __init__(self):
+        os.nice(LOADER_NICENESS)
+
+    def load(
+        self, path: str, embeddings: Embeddings
+    ) -> tuple[np.ndarray, list[bytes], MetadataIndex]:
+        """``load_version``, returned in a form that is cheap to take over.
+
+        Returns the serialized FAISS index, the documents as pickled pieces
+        of ``DOCS_PER_PIECE`` (FAISS id, docstore id, document) tuples, and
+        the metadata index.
+        """
+        index, metadata_index = load_version(path, embeddings)
+        ids = index.index_to_docstore_id
+        positions = sorted(ids)
+        pieces = []
+        for start in range(0, len(positions), DOCS_PER_PIECE):
+            piece = positions[start : start + DOCS_PER_PIECE]
+            docs = [(i, ids[i], index.docstore.search(ids[i])) for i in piece]
+            pieces.append(pickle.dumps(docs))
+        return faiss.serialize_index(index.index), pieces, metadata_index
+
 
 @serve.deployment
 class SearchDeployment:
-    def __init__(self):
+    async def __init__(
+        self,
+        embedder: DeploymentHandle,
+        index_dir: str = "faiss_index",
+        poll_interval: float | None = 10.0,
+    ):
         print("Loading pre-built index...")
-        # Initialize the embedding model - must match what was used for building
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-
-        # Check if index directory exists
-        import os
+        # Queries are embedded by the shared EmbeddingDeployment, which must
+        # serve the model the index was built with.
+        self.embeddings = DeploymentEmbeddings(embedder)
+        self.index_dir = index_dir
+        self.poll_interval = poll_interval
 
-        if not os.path.exists("faiss_index") or not os.path.isdir("faiss_index"):
-            error_msg = """
-ERROR: FAISS index directory not found!
+        # Check if the index exists
+        manifest = read_manifest(index_dir)
+        if manifest is None:
+            error_msg = f"""
+ERROR: FAISS index not found in '{index_dir}'!
 
 To build the index, please run:
     python build_index.py
 
 This will crawl the Ray documentation, create embeddings, and save the index
-to the 'faiss_index' directory. Once the index is built, you can restart this service.
+to the '{index_dir}' directory. Once the index is built, you can restart this service.
 """
             print(error_msg)
             raise FileNotFoundError(error_msg)
+        await self._check_model(manifest)
 
         # Load the pre-built index
         try:
-            self.index = FAISS.load_local(
-                "faiss_index", self.embeddings, allow_dangerous_deserialization=True
-            )
-            print(f"Successfully loaded index")
+            self.active = self._load(manifest)
+            print(f"Successfully loaded index version {self.active.version}")
         except Exception as e:
             error_msg = f"""
 ERROR: Failed to load FAISS index: {str(e)}
@@ -59,9 +146,111 @@ Please rebuild the index by running:
             print(error_msg)
             raise RuntimeError(error_msg)
 
+        # Versions that failed to load, so they aren't retried on every poll.
+        self._failed_versions: set[str] = set()
+        if poll_interval:
+            # Started now rather than on a new version, and next to the
+            # index directory on this node's disk.
+            self._loader = IndexLoader.options(
+                scheduling_strategy=NodeAffinitySchedulingStrategy(
+                    ray.get_runtime_context().get_node_id(), soft=False
+                )
+            ).remote()
+            self._watcher = asyncio.create_task(self._watch_index())
+
         print("SearchDeployment initialized successfully")
 
+    async def _check_model(self, manifest: dict) -> None:
+        """Raise unless ``manifest``'s vectors come from the model queries use.
+
+        Manifests that don't record a model, such as "unversioned", pass.
+        """
+        model_name = manifest.get("model_name")
+        if model_name is None:
+            return
+        serving = await self.embeddings.handle.model_name.remote()
+        if model_name != serving:
+            raise ValueError(
+                f"Index version {manifest['version']} was built with "
+                f"{model_name}, but queries are embedded with {serving}"
+            )
+
+    def _load(self, manifest: dict) -> LoadedIndex:
+        path = version_dir(self.index_dir, manifest)
+        index, metadata_index = load_version(path, self.embeddings)
+        return LoadedIndex(manifest["version"], index, metadata_index)
+
+    async def _load_in_background(self, manifest: dict) -> LoadedIndex:
+        """``_load`` on the loader, letting requests run on this replica."""
+        path = version_dir(self.index_dir, manifest)
+        serialized, pieces, metadata_index = await self._loader.load.remote(
+            path, self.embeddings
+        )
+        # Copies the vectors without holding the GIL.
+        index = await asyncio.to_thread(faiss.deserialize_index, serialized)
+        docs, index_to_docstore_id = {}, {}
+        for piece in pieces:
+            for i, doc_id, doc in pickle.loads(piece):
+                index_to_docstore_id[i] = doc_id
+                docs[doc_id] = doc
+            # Let requests run between pieces.
+            await asyncio.sleep(0)
+        loaded = FAISS(
+            self.embeddings, index, InMemoryDocstore(docs), index_to_docstore_id
+        )
+        return LoadedIndex(manifest["version"], loaded, metadata_index)
+
+    async def _watch_index(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            manifest = read_manifest(self.index_dir)
+            if (
+                manifest is None
+                or manifest["version"] == self.active.version
+                or manifest["version"] in self._failed_versions
+            ):
+                continue
+            try:
+                await self._reload(manifest)
+            except Exception:
+                # Keep serving the current version.
+                self._failed_versions.add(manifest["version"])
+                print(f"Failed to load index version {manifest['version']}:")
+                traceback.print_exc()
+
+    async def _reload(self, manifest: dict) -> None:
+        started = time.perf_counter()
+        print(f"Loading index version {manifest['version']} in the background...")
+        # Its vectors can't be searched with another model's query vectors.
+        await self._check_model(manifest)
+        # The current version keeps serving meanwhile.
+        loaded = await self._load_in_background(manifest)
+
+        # Warm up before taking traffic, which also checks that the new
+        # version works with the embedding model: embed the warmup queries
+        # and search them on it.
+        queries = manifest.get("warmup_queries") or WARMUP_QUERIES
+        embeddings = await asyncio.gather(
+            *(self.embeddings.aembed_query(query) for query in queries)
+        )
+        for embedding in embeddings:
+            if not await asyncio.to_thread(
+                search_with_selector, loaded.index, embedding, 5
+            ):
+                raise RuntimeError("Warmup query returned no results")
+
+        # One assignment: requests that already took the old version finish
+        # on it, later ones get the new one.
+        self.active = loaded
+        print(
+            f"Swapped in index version {loaded.version} "
+            f"({loaded.index.index.ntotal} vectors) after "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
     async def __call__(self, request):
+        # Every step of this request uses the same version, even across a swap.
+        active = self.active
         query = request.query_params.get("query", "")
         if not query:
             return {
@@ -69,10 +258,18 @@ Please rebuild the index by running:
                 "status": "empty_query",
                 "message": "Please provide a query parameter",
             }
+        # Optional filters, e.g. source_prefix=https://docs.ray.io/en/latest/serve/
+        source_prefix = request.query_params.get("source_prefix") or None
+        section = request.query_params.get("section") or None
 
         try:
-            # Search the index
-            results = self.index.similarity_search_with_score(query, k=5)
+            # Search the index, applying the filters inside the FAISS scan
+            # rather than over-fetching and dropping non-matching results.
+            selector = active.metadata_index.selector(source_prefix, section)
+            embedding = await self.embeddings.aembed_query(query)
+            results = await asyncio.to_thread(
+                search_with_selector, active.index, embedding, 5, selector
+            )
 
             # Format results for response
             formatted_results = []
@@ -91,10 +288,9 @@ Please rebuild the index by running:
                 "results": formatted_results,
                 "status": "success",
                 "message": f"Found {len(formatted_results)} results",
+                "index_version": active.version,
             }
         except Exception as e:
-            import traceback
-
             error_details = traceback.format_exc()
             print(f"Error during search: {str(e)}\n{error_details}")
 
@@ -108,15 +304,43 @@ Please rebuild the index by running:
 
 # For testing the deployment locally
 @app.get("/search")
-async def search(query: str = ""):
+async def search(query: str = "", source_prefix: str = "", section: str = ""):
     handle = serve.get_deployment_handle("SearchDeployment")
-    return await handle.remote({"query_params": {"query": query}})
+    query_params = {"query": query, "source_prefix": source_prefix, "section": section}
+    return await handle.remote({"query_params": query_params})
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--search-replicas", type=int, default=1)
+    parser.add_argument(
+        "--embedding-replicas",
+        type=int,
+        help="default: keep a running embeddings app's count, 1 for a new one",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=10.0,
+        help="seconds between checks for a new index version (0: never)",
+    )
+    args = parser.parse_args()
+
+    # Initialize Ray
+    ray.init()
+
     try:
+        # The embedding model runs in its own application, shared with
+        # build_index and scaled separately from the index replicas.
+        # Serve the model the current index version was built with.
+        manifest = read_manifest("faiss_index") or {}
+        embedder = get_embedder(
+            args.embedding_replicas, manifest.get("model_name", MODEL_NAME)
+        )
         # Deploy the search service
-        deployment = SearchDeployment.bind()
+        deployment = SearchDeployment.options(
+            num_replicas=args.search_replicas
+        ).bind(embedder, poll_interval=args.poll_interval)
         serve.run(deployment)
 
         print("\n" + "=" * 60)
@@ -141,8 +365,6 @@ if __name__ == "__main__":
         print(f"\nERROR: Failed to start service: {str(e)}")
         print("\nIf this is related to the FAISS index, please rebuild it with:")
         print("    python build_index.py\n")
-        import traceback
-
         traceback.print_exc()
         import sys
 
@@ -5,13 +5,16 @@ import json
 import requests
 
 
-def test_search(query="How can Ray help with deploying LLMs?"):
-    """Query the Ray Serve deployment and print results."""
-    # URL encode the query
-    encoded_query = requests.utils.quote(query)
+def test_search(query="How can Ray help with deploying LLMs?", **filters):
+    """Query the Ray Serve deployment and print results.
+
+    Keyword arguments (``source_prefix``, ``section``) filter the results.
+    """
+    # URL encode the query and filters
+    encoded_query = requests.compat.urlencode({"query": query, **filters})
 
     # Make the request
-    url = f"http://localhost:8000/?query={encoded_query}"
+    url = f"http://localhost:8000/?{encoded_query}"
     print(f"Querying: {url}")
 
     try:
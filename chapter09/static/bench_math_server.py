@@ -0,0 +1,119 @@
+"""Tool-call latency of math_server.py: stdio per session vs persistent HTTP vs batched.
+
+- stdio: every session spawns ``math_server.py`` (what the notebook does),
+  so each pays interpreter and FastMCP startup before its first call.
+- http: one long-lived ``--transport streamable-http`` server; sessions
+  connect to it and call ``add`` one operation at a time.
+- batched: same server, ``add_batch`` with ``--batch-size`` operations per call.
+
+Every mode performs the same ``--sessions`` x ``--ops`` additions and checks
+the results; ops/s includes session setup.
+
+Run:
+> uv run static/bench_math_server.py --sessions 10 --ops 20 --batch-size 20
+"""
+
+import argparse
+import asyncio
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamable_http_client
+
+SERVER = pathlib.Path(__file__).with_name("math_server.py")
+
+
+class Timings:
+    def __init__(self):
+        self.setup: list[float] = []
+        self.calls: list[float] = []
+        self.ops = 0
+
+    def report(self, name: str, wall: float) -> str:
+        calls = sorted(self.calls)
+        p95 = calls[min(len(calls) - 1, int(0.95 * len(calls)))]
+        return (
+            f"{name:<8} setup {statistics.mean(self.setup) * 1000:7.1f} ms  "
+            f"call p50 {statistics.median(calls) * 1000:6.2f} ms  "
+            f"p95 {p95 * 1000:6.2f} ms  {len(calls) / wall:8.1f} calls/s  "
+            f"{self.ops / wall:8.1f} ops/s"
+        )
+
+
+async def run_session(connect, timings: Timings, ops: int, batch_size: int) -> None:
+    started = time.perf_counter()
+    async with connect() as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            timings.setup.append(time.perf_counter() - started)
+            for start in range(0, ops, batch_size):
+                a = list(range(start, min(start + batch_size, ops)))
+                b = [x * 2 for x in a]
+                started = time.perf_counter()
+                if batch_size == 1:
+                    result = await session.call_tool("add", {"a": a[0], "b": b[0]})
+                    expected = a[0] + b[0]
+                else:
+                    result = await session.call_tool("add_batch", {"a": a, "b": b})
+                    expected = [x + y for x, y in zip(a, b)]
+                timings.calls.append(time.perf_counter() - started)
+                assert not result.isError, result.content
+                assert result.structuredContent["result"] == expected
+                timings.ops += len(a)
+
+
+async def run_mode(connect, args: argparse.Namespace, batch_size: int) -> tuple:
+    timings = Timings()
+    started = time.perf_counter()
+    for _ in range(args.sessions):
+        await run_session(connect, timings, args.ops, batch_size)
+    return timings, time.perf_counter() - started
+
+
+def start_http_server(port: int) -> subprocess.Popen:
+    cmd = [sys.executable, str(SERVER), "--transport", "streamable-http"]
+    proc = subprocess.Popen(cmd + ["--port", str(port)])
+    for _ in range(200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("math_server.py didn't start")
+
+
+async def main(args: argparse.Namespace) -> None:
+    params = StdioServerParameters(
+        command=sys.executable, args=[str(SERVER)], env=dict(os.environ)
+    )
+    url = f"http://127.0.0.1:{args.port}/mcp"
+    proc = start_http_server(args.port)
+    try:
+        modes = [
+            ("stdio", lambda: stdio_client(params), 1),
+            ("http", lambda: streamable_http_client(url), 1),
+            ("batched", lambda: streamable_http_client(url), args.batch_size),
+        ]
+        print(f"{args.sessions} sessions x {args.ops} additions")
+        for name, connect, batch_size in modes:
+            timings, wall = await run_mode(connect, args, batch_size)
+            print(timings.report(name, wall))
+    finally:
+        proc.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--ops", type=int, default=20, help="additions per session")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8120)
+    asyncio.run(main(parser.parse_args()))
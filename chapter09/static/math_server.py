@@ -1,3 +1,13 @@
+"""MCP math server.
+
+Runs over stdio by default, one process per client session. With
+``--transport streamable-http`` it stays up and serves any number of
+sessions over HTTP at ``http://127.0.0.1:PORT/mcp``.
+"""
+
+import argparse
+import logging
+
 from mcp.server.fastmcp import FastMCP
 
 mcp = FastMCP("Math")
@@ -15,5 +25,38 @@ def multiply(a: int, b: int) -> int:
     return a * b
 
 
+def _check_same_length(a: list[int], b: list[int]) -> None:
+    if len(a) != len(b):
+        raise ValueError(f"a and b differ in length: {len(a)} != {len(b)}")
+
+
+@mcp.tool()
+def add_batch(a: list[int], b: list[int]) -> list[int]:
+    """Add many pairs of numbers at once: [a[0] + b[0], a[1] + b[1], ...]"""
+    _check_same_length(a, b)
+    return [x + y for x, y in zip(a, b)]
+
+
+@mcp.tool()
+def multiply_batch(a: list[int], b: list[int]) -> list[int]:
+    """Multiply many pairs of numbers at once: [a[0] * b[0], a[1] * b[1], ...]"""
+    _check_same_length(a, b)
+    return [x * y for x, y in zip(a, b)]
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--transport", choices=["stdio", "streamable-http"], default="stdio"
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    # INFO logs every request, which costs more than the arithmetic.
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    mcp.settings.port = args.port
+    # Plain JSON responses instead of a one-event SSE stream per tool call.
+    mcp.settings.json_response = True
+    mcp.settings.log_level = args.log_level
+    logging.getLogger().setLevel(args.log_level)
+    mcp.run(transport=args.transport)
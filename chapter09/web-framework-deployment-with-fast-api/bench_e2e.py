@@ -0,0 +1,132 @@
+"""End-to-end benchmark for ``/chat`` and ``/ws``.
+
+Drives a running ``main.py`` at a chosen concurrency and reports time to first
+token, inter-token latency, total latency percentiles and the CPU time the
+server spent, taken from its ``/metrics`` endpoint. Start ``fake_llm.py`` and
+point ``.env`` at it to benchmark without a paid provider.
+
+Run:
+> python bench_e2e.py --endpoint ws --concurrency 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+import websockets
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return {"p50_ms": at(0.50), "p90_ms": at(0.90), "p99_ms": at(0.99), "max_ms": values[-1] * 1000}
+
+
+async def chat_worker(client: httpx.AsyncClient, url: str, message: str, n: int, out: dict):
+    for _ in range(n):
+        start = time.perf_counter()
+        response = await client.post(f"{url}/chat", json={"message": message})
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            out["errors"] += 1
+            continue
+        # /chat is not streamed: the first token arrives with the whole answer.
+        out["ttft"].append(elapsed)
+        out["total"].append(elapsed)
+
+
+async def ws_worker(url: str, message: str, n: int, out: dict):
+    ws_url = url.replace("http", "ws", 1) + "/ws"
+    async with websockets.connect(ws_url, max_size=None) as websocket:
+        for _ in range(n):
+            request_id = uuid.uuid4().hex
+            start = time.perf_counter()
+            await websocket.send(json.dumps({"message": message, "request_id": request_id}))
+            last = None
+            while True:
+                frame = json.loads(await websocket.recv())
+                if frame.get("request_id") != request_id:
+                    continue
+                now = time.perf_counter()
+                kind = frame["message_type"]
+                if kind == "stream":
+                    if last is None:
+                        out["ttft"].append(now - start)
+                    else:
+                        out["itl"].append(now - last)
+                    last = now
+                elif kind == "end":
+                    out["total"].append(now - start)
+                    break
+                elif kind in ("error", "cancelled"):
+                    out["errors"] += 1
+                    break
+
+
+async def server_cpu(client: httpx.AsyncClient, url: str) -> float | None:
+    try:
+        response = await client.get(f"{url}/metrics")
+        return response.json()["process"]["cpu_seconds"]
+    except (httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+async def run(endpoint: str, args: argparse.Namespace) -> dict:
+    out = {"ttft": [], "itl": [], "total": [], "errors": 0}
+    per_worker = [args.requests // args.concurrency] * args.concurrency
+    for i in range(args.requests % args.concurrency):
+        per_worker[i] += 1
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        cpu_before = await server_cpu(client, args.url)
+        start = time.perf_counter()
+        if endpoint == "chat":
+            workers = [chat_worker(client, args.url, args.message, n, out) for n in per_worker]
+        else:
+            workers = [ws_worker(args.url, args.message, n, out) for n in per_worker]
+        await asyncio.gather(*workers)
+        wall = time.perf_counter() - start
+        cpu_after = await server_cpu(client, args.url)
+
+    completed = len(out["total"])
+    report = {
+        "endpoint": endpoint,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "completed": completed,
+        "errors": out["errors"],
+        "requests_per_sec": completed / wall,
+        "ttft": percentiles(out["ttft"]),
+        "inter_token": percentiles(out["itl"]),
+        "total": percentiles(out["total"]),
+    }
+    if cpu_before is not None and cpu_after is not None:
+        report["server_cpu_seconds"] = cpu_after - cpu_before
+        report["server_cpu_ms_per_request"] = (
+            (cpu_after - cpu_before) * 1000 / completed if completed else None
+        )
+    return report
+
+
+async def main(args: argparse.Namespace) -> None:
+    endpoints = ["chat", "ws"] if args.endpoint == "both" else [args.endpoint]
+    reports = [await run(endpoint, args) for endpoint in endpoints]
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["chat", "ws", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--message", default="Tell me a short story.")
+    asyncio.run(main(parser.parse_args()))
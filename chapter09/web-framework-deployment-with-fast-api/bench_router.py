@@ -0,0 +1,110 @@
+"""Tail latency of a single provider vs latency-aware routing vs hedging.
+
+Starts two ``fake_llm.py`` stand-ins with different latency profiles and
+sends the same sequence of chat requests through ``utils.Router`` in three
+configurations, reporting latency percentiles for each.
+
+Run:
+> python bench_router.py --requests 300 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+import httpx
+from langchain_openai import ChatOpenAI
+from utils import Backend, Router
+
+FAKE_LLM = pathlib.Path(__file__).with_name("fake_llm.py")
+
+# name: (port, fake_llm.py arguments)
+PROVIDERS = {
+    # Usually fast, with a slow tail.
+    "spiky": (8101, ["--latency", "0.05", "--tail-rate", "0.1", "--tail-latency", "1.0"]),
+    # Slower median, rarely slow.
+    "steady": (8102, ["--latency", "0.12", "--tail-rate", "0.01", "--tail-latency", "1.0"]),
+}
+
+
+def start_providers() -> list[subprocess.Popen]:
+    procs = []
+    for port, extra in PROVIDERS.values():
+        cmd = [sys.executable, str(FAKE_LLM), "--port", str(port), "--ttft", "0"]
+        cmd += ["--output-tokens", "5", "--tokens-per-sec", "0", *extra]
+        procs.append(subprocess.Popen(cmd))
+    for port, _ in PROVIDERS.values():
+        for _ in range(100):
+            try:
+                httpx.post(f"http://127.0.0.1:{port}/v1/chat/completions", json={})
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+    return procs
+
+
+def backends(names: list[str]) -> list[Backend]:
+    return [
+        Backend(
+            name,
+            ChatOpenAI(
+                api_key="fake",
+                base_url=f"http://127.0.0.1:{PROVIDERS[name][0]}/v1",
+                model="fake",
+                max_retries=0,
+            ),
+        )
+        for name in names
+    ]
+
+
+def percentiles(values: list[float]) -> dict:
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+    return {"p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": at(1.0)}
+
+
+async def run(name: str, router: Router, args: argparse.Namespace) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await router.ainvoke("hello")
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return {"mode": name, **percentiles(latencies), **router.metrics()}
+
+
+async def main(args: argparse.Namespace) -> None:
+    procs = start_providers()
+    try:
+        reports = [
+            await run("single:spiky", Router(backends(["spiky"])), args),
+            await run("route", Router(backends(["spiky", "steady"])), args),
+            await run(
+                "route+hedge",
+                Router(backends(["spiky", "steady"]), hedge=True, default_hedge_delay=0.2),
+                args,
+            ),
+        ]
+    finally:
+        for proc in procs:
+            proc.terminate()
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""Benchmark per-token WebSocket frames against coalesced streaming.
+
+Replays a synthetic token stream into an in-process WebSocket stand-in that
+serializes every frame, and reports frames/sec and server CPU per response.
+
+Run:
+> python bench_streaming.py --tokens 2000 --tokens-per-sec 2000 --responses 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from streaming import FrameSender, SlowConsumerPolicy, StreamSettings, stream_tokens
+
+
+class FakeWebSocket:
+    """Serializes frames like Starlette does, optionally with a slow link."""
+
+    def __init__(self, send_delay: float = 0.0):
+        self.send_delay = send_delay
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_json(self, data: dict) -> None:
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        self.frames += 1
+        self.bytes += len(text.encode("utf-8"))
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        else:
+            # A real socket write yields to the event loop.
+            await asyncio.sleep(0)
+
+
+async def fake_tokens(n: int, tokens_per_sec: float):
+    """Yield ``n`` word-sized tokens at roughly ``tokens_per_sec``."""
+    interval = 1 / tokens_per_sec if tokens_per_sec else 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i in range(n):
+        if interval:
+            delay = start + i * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield f" tok{i % 97}"
+
+
+async def per_token(websocket: FakeWebSocket, tokens) -> None:
+    """The original ``/ws`` loop: one frame per token."""
+    async for token in tokens:
+        await websocket.send_json(
+            {"sender": "bot", "message_type": "stream", "message": token}
+        )
+
+
+async def coalesced(websocket: FakeWebSocket, tokens, settings: StreamSettings) -> None:
+    """The ``/ws`` path: coalesced frames through a bounded send buffer."""
+    sender = FrameSender.from_settings(websocket, settings)
+    send_task = asyncio.create_task(sender.run())
+    await stream_tokens(sender, tokens, settings)
+    await sender.close()
+    await send_task
+
+
+async def run(mode: str, args: argparse.Namespace) -> dict:
+    settings = StreamSettings(
+        max_frame_chars=args.max_frame_chars,
+        flush_interval=args.flush_interval,
+        max_pending_frames=args.max_pending_frames,
+        slow_consumer_policy=SlowConsumerPolicy(args.policy),
+    )
+    frames = 0
+    wall = 0.0
+    cpu = 0.0
+    for _ in range(args.responses):
+        websocket = FakeWebSocket(args.send_delay)
+        tokens = fake_tokens(args.tokens, args.tokens_per_sec)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if mode == "per-token":
+            await per_token(websocket, tokens)
+        else:
+            await coalesced(websocket, tokens, settings)
+        wall += time.perf_counter() - wall_start
+        cpu += time.process_time() - cpu_start
+        frames += websocket.frames
+
+    return {
+        "mode": mode,
+        "frames_per_response": frames / args.responses,
+        "frames_per_sec": frames / wall,
+        "cpu_ms_per_response": cpu * 1000 / args.responses,
+        "wall_ms_per_response": wall * 1000 / args.responses,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = [await run(mode, args) for mode in ("per-token", "coalesced")]
+    print(
+        f"{'mode':<10} {'frames/resp':>12} {'frames/s':>10} {'cpu ms/resp':>12} {'wall ms/resp':>13}"
+    )
+    for r in results:
+        print(
+            f"{r['mode']:<10} {r['frames_per_response']:>12.1f} {r['frames_per_sec']:>10.0f} "
+            f"{r['cpu_ms_per_response']:>12.2f} {r['wall_ms_per_response']:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument(
+        "--tokens-per-sec", type=float, default=0, help="0 replays as fast as possible"
+    )
+    parser.add_argument("--responses", type=int, default=20)
+    parser.add_argument("--send-delay", type=float, default=0.0)
+    parser.add_argument("--max-frame-chars", type=int, default=256)
+    parser.add_argument("--flush-interval", type=float, default=0.005)
+    parser.add_argument("--max-pending-frames", type=int, default=64)
+    parser.add_argument(
+        "--policy", choices=[p.value for p in SlowConsumerPolicy], default="block"
+    )
+    asyncio.run(main(parser.parse_args()))
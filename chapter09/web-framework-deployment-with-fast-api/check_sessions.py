@@ -0,0 +1,160 @@
+"""Check that ChatSession leaves nothing running after a cancel or disconnect.
+
+Drives a session through a scripted WebSocket stand-in with a generator that
+streams until it's closed, and asserts that:
+- a cancelled generation's stream is closed, the others keep streaming
+- after the client disconnects, every generate stream is closed and no
+  session task (generations, sender) is left on the event loop
+- a cancel without a ``request_id`` is rejected without using up a server id
+- client ids can't take the server's ``srv-`` prefix
+
+Run:
+> uv run check_sessions.py
+"""
+
+import asyncio
+import json
+
+from sessions import ChatSession
+from starlette.websockets import WebSocketDisconnect
+from streaming import StreamSettings
+
+
+class ScriptedWebSocket:
+    """Receives scripted client messages and records the frames sent."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.frames: list[dict] = []
+
+    async def receive_text(self) -> str:
+        message = await self.incoming.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    async def send_json(self, data: dict) -> None:
+        self.frames.append(data)
+        await asyncio.sleep(0)
+
+    def send(self, message: dict | str) -> None:
+        self.incoming.put_nowait(
+            message if isinstance(message, str) else json.dumps(message)
+        )
+
+    def disconnect(self) -> None:
+        self.incoming.put_nowait(WebSocketDisconnect(code=1001))
+
+    def types(self, request_id: str) -> list[str]:
+        return [
+            f["message_type"] for f in self.frames if f.get("request_id") == request_id
+        ]
+
+
+class EndlessGenerate:
+    """Streams tokens until closed; tracks which streams are still open."""
+
+    def __init__(self):
+        self.open: set[str] = set()
+        self.started: list[str] = []
+
+    async def __call__(self, user_message: str):
+        self.open.add(user_message)
+        self.started.append(user_message)
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield f" {user_message}"
+        finally:
+            self.open.discard(user_message)
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+async def disconnect(websocket: ScriptedWebSocket, serving: asyncio.Task) -> None:
+    """Disconnect the client and wait for the session to shut down."""
+    websocket.disconnect()
+    try:
+        async with asyncio.timeout(2.0):
+            await serving
+    except WebSocketDisconnect:
+        pass
+    except TimeoutError:
+        raise AssertionError("session did not shut down after the disconnect")
+
+
+def leftover_tasks() -> set[asyncio.Task]:
+    return asyncio.all_tasks() - {asyncio.current_task()}
+
+
+async def check_cancel_then_disconnect() -> None:
+    websocket = ScriptedWebSocket()
+    generate = EndlessGenerate()
+    session = ChatSession(websocket, generate, StreamSettings(flush_interval=0.001))
+    serving = asyncio.create_task(session.serve())
+
+    for name in ("a", "b", "c"):
+        websocket.send({"message": name, "request_id": name})
+    await wait_for(lambda: all("stream" in websocket.types(n) for n in "abc"))
+
+    websocket.send({"type": "cancel", "request_id": "b"})
+    await wait_for(lambda: "cancelled" in websocket.types("b"))
+    assert generate.open == {"a", "c"}, generate.open
+    assert set(session.generations) == {"a", "c"}, session.generations
+    streamed = len(websocket.types("a"))
+    await wait_for(lambda: len(websocket.types("a")) > streamed)
+
+    await disconnect(websocket, serving)
+    assert not generate.open, f"generate streams left open: {generate.open}"
+    assert not session.generations, session.generations
+    assert not leftover_tasks(), f"tasks left running: {leftover_tasks()}"
+    print("cancel, then disconnect: ok")
+
+
+async def check_disconnect_mid_stream() -> None:
+    websocket = ScriptedWebSocket()
+    generate = EndlessGenerate()
+    session = ChatSession(websocket, generate, StreamSettings(), max_concurrent=8)
+    serving = asyncio.create_task(session.serve())
+
+    for i in range(8):
+        websocket.send(f"m{i}")
+    await wait_for(lambda: len(generate.open) == 8)
+    await disconnect(websocket, serving)
+    assert not generate.open, f"generate streams left open: {generate.open}"
+    assert not session.generations, session.generations
+    assert not leftover_tasks(), f"tasks left running: {leftover_tasks()}"
+    print("disconnect mid-stream: ok")
+
+
+async def check_request_ids() -> None:
+    websocket = ScriptedWebSocket()
+    generate = EndlessGenerate()
+    session = ChatSession(websocket, generate, StreamSettings())
+    serving = asyncio.create_task(session.serve())
+
+    websocket.send({"type": "cancel"})
+    websocket.send({"message": "taken", "request_id": "srv-1"})
+    websocket.send("first")
+    await wait_for(lambda: "start" in websocket.types("srv-1"))
+    assert websocket.types("") == ["error"], websocket.frames
+    assert websocket.types("srv-1")[0] == "error", websocket.frames
+    assert generate.started == ["first"], generate.started
+
+    await disconnect(websocket, serving)
+    assert not generate.open and not leftover_tasks()
+    print("request ids: ok")
+
+
+async def main() -> None:
+    await check_cancel_then_disconnect()
+    await check_disconnect_mid_stream()
+    await check_request_ids()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,275 @@
+"""Local stand-in for the Anthropic and OpenAI-compatible chat APIs.
+
+Serves ``POST /v1/messages`` (what ``Config.new_anthropic`` calls) and
+``POST /v1/chat/completions`` (what ``Config.new_openai_like`` calls), both
+plain and SSE-streamed, with configurable latency, time-to-first-token and
+tokens/sec, so ``main.py`` can be load-tested without a paid provider.
+
+Run:
+> python fake_llm.py --port 8001 --ttft 0.3 --tokens-per-sec 50
+
+and point the app at it in ``.env``:
+    ANTHROPIC_BASE_URL=http://localhost:8001
+    OPENAI_API_BASE_URL=http://localhost:8001/v1
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the quick brown fox jumps over the lazy dog while a patient model streams "
+    "tokens back to a curious client one small piece at a time"
+).split()
+
+
+@dataclass
+class FakeSettings:
+    # Delay before any response bytes, e.g. connection and queueing overhead.
+    latency: float = 0.05
+    # Additional delay before the first token.
+    ttft: float = 0.2
+    tokens_per_sec: float = 50.0
+    # Tokens per answer, capped by the request's max_tokens.
+    output_tokens: int = 100
+    # Probability of answering with HTTP 529 (overloaded).
+    error_rate: float = 0.0
+    # Share of requests delayed by an extra tail_latency seconds.
+    tail_rate: float = 0.0
+    tail_latency: float = 1.0
+
+
+settings = FakeSettings()
+app = FastAPI()
+_calls = 0
+
+
+def _answer_tokens(max_tokens: int | None) -> list[str]:
+    n = settings.output_tokens if not max_tokens else min(max_tokens, settings.output_tokens)
+    return [("" if i == 0 else " ") + WORDS[i % len(WORDS)] for i in range(n)]
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    text = json.dumps(messages, ensure_ascii=False)
+    return max(1, len(text) // 4)
+
+
+async def _tokens(tokens: list[str]):
+    """Yield ``tokens`` paced by the configured TTFT and tokens/sec."""
+    await asyncio.sleep(settings.ttft)
+    interval = 1 / settings.tokens_per_sec if settings.tokens_per_sec > 0 else 0
+    start = time.monotonic()
+    for i, token in enumerate(tokens):
+        if interval and i:
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield token
+
+
+def _every(rate: float) -> bool:
+    # Deterministic spread so runs are reproducible.
+    return rate > 0 and (_calls * rate) % 1 < rate
+
+
+async def _delay() -> None:
+    global _calls
+    _calls += 1
+    latency = settings.latency
+    if _every(settings.tail_rate):
+        latency += settings.tail_latency
+    await asyncio.sleep(latency)
+
+
+def _should_fail() -> bool:
+    return _every(settings.error_rate)
+
+
+def _sse(event: str | None, data: dict | str) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+
+@app.post("/v1/messages")
+async def anthropic_messages(request: Request):
+    body = await request.json()
+    await _delay()
+    if _should_fail():
+        return _overloaded()
+
+    model = body.get("model", "fake")
+    input_tokens = _prompt_tokens(body.get("messages", []))
+    tokens = _answer_tokens(body.get("max_tokens"))
+    message_id = f"msg_{uuid.uuid4().hex}"
+
+    if not body.get("stream"):
+        text = "".join([t async for t in _tokens(tokens)])
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": len(tokens)},
+        }
+
+    async def events():
+        yield _sse(
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": message_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "model": model,
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+                },
+            },
+        )
+        yield _sse(
+            "content_block_start",
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+        )
+        async for token in _tokens(tokens):
+            yield _sse(
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": token},
+                },
+            )
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(tokens)},
+            },
+        )
+        yield _sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    body = await request.json()
+    await _delay()
+    if _should_fail():
+        return _overloaded()
+
+    model = body.get("model", "fake")
+    prompt_tokens = _prompt_tokens(body.get("messages", []))
+    tokens = _answer_tokens(body.get("max_completion_tokens") or body.get("max_tokens"))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens),
+    }
+
+    if not body.get("stream"):
+        text = "".join([t async for t in _tokens(tokens)])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    def chunk(delta: dict, finish_reason: str | None = None) -> str:
+        return _sse(
+            None,
+            {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            },
+        )
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        async for token in _tokens(tokens):
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield _sse(
+                None,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                },
+            )
+        yield _sse(None, "[DONE]")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _overloaded() -> JSONResponse:
+    return JSONResponse(
+        {
+            "type": "error",
+            "error": {"type": "overloaded_error", "message": "Overloaded"},
+        },
+        status_code=529,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=settings.latency)
+    parser.add_argument("--ttft", type=float, default=settings.ttft)
+    parser.add_argument("--tokens-per-sec", type=float, default=settings.tokens_per_sec)
+    parser.add_argument("--output-tokens", type=int, default=settings.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate)
+    parser.add_argument("--tail-rate", type=float, default=settings.tail_rate)
+    parser.add_argument("--tail-latency", type=float, default=settings.tail_latency)
+    args = parser.parse_args()
+
+    settings.latency = args.latency
+    settings.ttft = args.ttft
+    settings.tokens_per_sec = args.tokens_per_sec
+    settings.output_tokens = args.output_tokens
+    settings.error_rate = args.error_rate
+    settings.tail_rate = args.tail_rate
+    settings.tail_latency = args.tail_latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -1,16 +1,28 @@
 """FastAPI webapp."""
 
 import asyncio
-import json
 import logging
+import os
+import time
+from collections.abc import AsyncIterator
 
 import uvicorn
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from langchain_classic.callbacks import AsyncIteratorCallbackHandler
-from langchain.messages import HumanMessage
-from utils import Config
+from langchain.messages import AIMessage, HumanMessage
+from scheduler import (
+    AdmissionError,
+    DeadlineExceededError,
+    Priority,
+    Scheduler,
+    SchedulerSettings,
+    estimate_tokens,
+)
+from sessions import ChatSession
+from streaming import SlowConsumerError, StreamSettings
+from utils import Config, Router, TracingCallbackHandler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,8 +33,33 @@ app = FastAPI()
 # Setup templates and static files
 templates = Jinja2Templates(directory="templates")
 
-# Initialize a non-streaming LLM for the regular API endpoints
-regular_llm = Config().new_anthropic(temperature=0)
+# Initialize a non-streaming LLM for the regular API endpoints.
+# LLM_ROUTING=route|hedge spreads them over every configured provider instead.
+llm_routing = os.getenv("LLM_ROUTING", "off")
+if llm_routing in ("route", "hedge"):
+    regular_llm = Config().new_router(hedge=llm_routing == "hedge", temperature=0)
+else:
+    regular_llm = Config().new_anthropic(temperature=0)
+
+# How WebSocket responses are batched into frames and buffered per connection
+stream_settings = StreamSettings.from_env()
+
+# LLM call spans (TTFT, latency, tokens), written to TRACE_FILE when it's set
+tracer = TracingCallbackHandler.from_env()
+trace_config = {"callbacks": [tracer] if tracer else []}
+
+# Admission control in front of each provider, see scheduler.py
+anthropic_scheduler = Scheduler("anthropic", SchedulerSettings.from_env("ANTHROPIC"))
+schedulers = {anthropic_scheduler.name: anthropic_scheduler}
+if isinstance(regular_llm, Router):
+    for backend in regular_llm.backends:
+        if backend.name not in schedulers:
+            schedulers[backend.name] = Scheduler(
+                backend.name, SchedulerSettings.from_env(backend.name.upper())
+            )
+# How long a request may wait for admission before it is shed
+chat_deadline = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+ws_deadline = float(os.getenv("WS_DEADLINE_SECONDS", "10"))
 
 
 # Root endpoint
@@ -41,69 +78,93 @@ async def chat(request: Request):
 
     # Create the messages for the LLM
     messages = [HumanMessage(content=user_message)]
-    response = regular_llm.invoke(messages)
-    return {"response": response.content}
+    deadline = time.monotonic() + chat_deadline
+
+    async def admitted(provider: str, call) -> AIMessage:
+        # Admitted by the scheduler of the provider the call actually goes to
+        async with schedulers[provider].slot(
+            Priority.BATCH,
+            estimate_tokens(user_message, getattr(regular_llm, "max_tokens", None)),
+            deadline=deadline,
+        ) as ticket:
+            response = await call()
+            if response.usage_metadata:
+                ticket.record_usage(response.usage_metadata["total_tokens"])
+            return response
 
-
-# WebSocket for streaming responses
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
     try:
-        while True:
-            # Create a new callback handler for each request
-            callback_handler = AsyncIteratorCallbackHandler()
-
-            # Receive message from client
-            data = await websocket.receive_text()
-            logger.info(f"Received WebSocket data: {repr(data)}")
-
-            # Extract user message
-            try:
-                parsed_data = json.loads(data)
-                user_message = parsed_data.get("message", "")
-            except json.JSONDecodeError:
-                user_message = data
-
-            if not user_message:
-                await websocket.send_json(
-                    {
-                        "sender": "bot",
-                        "message_type": "error",
-                        "message": "No message provided",
-                    }
-                )
-                continue
-
-            # Start notification
-            await websocket.send_json({"sender": "bot", "message_type": "start"})
-
-            # Create a streaming model instance with the callback handler for this specific request
-            streaming_llm = Config().new_anthropic(
-                temperature=0, callbacks=[callback_handler], streaming=True
+        if isinstance(regular_llm, Router):
+            response = await regular_llm.ainvoke(
+                messages, trace_config, admission=admitted
             )
+        else:
+            response = await admitted(
+                anthropic_scheduler.name,
+                lambda: regular_llm.ainvoke(messages, trace_config),
+            )
+    except AdmissionError as e:
+        status_code = 503 if isinstance(e, DeadlineExceededError) else 429
+        return JSONResponse({"response": str(e)}, status_code=status_code)
+    return {"response": response.content}
 
-            # Start generation in a background task
-            async def generate_response():
-                messages = [HumanMessage(content=user_message)]
-                await streaming_llm.ainvoke(messages)
-
-            task = asyncio.create_task(generate_response())
 
-            # Stream the response pieces as they become available
+# Scheduler and process metrics
+@app.get("/metrics")
+async def metrics():
+    return {
+        "process": {"cpu_seconds": time.process_time()},
+        "schedulers": {name: s.metrics() for name, s in schedulers.items()},
+        "router": regular_llm.metrics() if isinstance(regular_llm, Router) else None,
+        "tracing": tracer.metrics() if tracer else None,
+    }
+
+
+async def generate_stream(user_message: str) -> AsyncIterator[str]:
+    """Stream the tokens of one answer, aborting the model call if closed early."""
+    # Create a new callback handler for each request
+    callback_handler = AsyncIteratorCallbackHandler()
+
+    # Create a streaming model instance with the callback handler for this specific request
+    streaming_llm = Config().new_anthropic(
+        temperature=0, callbacks=[callback_handler], streaming=True
+    )
+
+    # Interactive traffic goes ahead of batch /chat requests
+    async with anthropic_scheduler.slot(
+        Priority.INTERACTIVE,
+        estimate_tokens(user_message, streaming_llm.max_tokens),
+        deadline=time.monotonic() + ws_deadline,
+    ) as ticket:
+        # Start generation in a background task
+        messages = [HumanMessage(content=user_message)]
+        task = asyncio.create_task(streaming_llm.ainvoke(messages, trace_config))
+        try:
             async for token in callback_handler.aiter():
-                await websocket.send_json(
-                    {"sender": "bot", "message_type": "stream", "message": token}
-                )
+                yield token
 
             # Ensure the task is complete
-            await task
+            response = await task
+            if response.usage_metadata:
+                ticket.record_usage(response.usage_metadata["total_tokens"])
+        finally:
+            # Cancelling the task closes the upstream HTTP stream.
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
-            # Send completion notification
-            await websocket.send_json({"sender": "bot", "message_type": "end"})
 
+# WebSocket for streaming responses
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    session = ChatSession(websocket, generate_stream, stream_settings)
+    try:
+        await session.serve()
     except WebSocketDisconnect:
         logger.info("Client disconnected")
+    except SlowConsumerError as e:
+        logger.warning(f"Dropping slow WebSocket client: {str(e)}")
+        # 1013: try again later
+        await websocket.close(code=1013)
     except Exception as e:
         logger.error(f"Error in WebSocket: {str(e)}", exc_info=True)
         await websocket.send_json(
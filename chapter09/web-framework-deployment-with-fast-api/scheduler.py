@@ -0,0 +1,287 @@
+"""Admission control and priority scheduling for LLM calls.
+
+Every model call first asks the provider's ``Scheduler`` for a slot. Requests
+wait in a bounded priority queue, interactive WebSocket traffic ahead of batch
+``/chat`` traffic, and are admitted once the provider's request and token
+buckets allow it. Requests that can no longer be admitted before their deadline
+are shed instead of being sent upstream to time out or get rate limited.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class AdmissionError(Exception):
+    """Base class for requests the scheduler refused to run."""
+
+
+class QueueFullError(AdmissionError):
+    """The queue is full of requests at least as important as this one."""
+
+
+class DeadlineExceededError(AdmissionError):
+    """The request could not be admitted before its deadline."""
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units per minute up to ``capacity``.
+
+    A non-positive rate disables the limit.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units can be taken."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # Requests larger than the bucket only need a full bucket.
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Consume ``amount`` units; negative amounts give units back."""
+        if self.rate <= 0:
+            return
+        self._refill(time.monotonic())
+        # The level may go negative when actual usage exceeds the estimate.
+        self.level = min(self.capacity, self.level - amount)
+
+
+@dataclass
+class SchedulerSettings:
+    # Provider rate limits; 0 disables a limit.
+    requests_per_minute: float = 0
+    tokens_per_minute: float = 0
+    # Requests waiting for admission.
+    max_queue: int = 100
+    # Requests admitted and not yet finished.
+    max_in_flight: int = 16
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "SchedulerSettings":
+        """Read settings from ``<prefix>_RPM``, ``<prefix>_TPM`` and friends."""
+        return cls(
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM", cls.requests_per_minute)),
+            tokens_per_minute=float(os.getenv(f"{prefix}_TPM", cls.tokens_per_minute)),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", cls.max_queue)),
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", cls.max_in_flight)),
+        )
+
+
+@dataclass
+class Ticket:
+    """Admission granted to one request."""
+
+    scheduler: "Scheduler"
+    estimated_tokens: int
+    waited: float
+
+    def record_usage(self, total_tokens: int) -> None:
+        """Correct the token bucket with the tokens the call actually used."""
+        self.scheduler.tokens.take(total_tokens - self.estimated_tokens)
+        self.estimated_tokens = total_tokens
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    deadline: float | None = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class Scheduler:
+    """Admission queue in front of one provider."""
+
+    def __init__(self, name: str, settings: SchedulerSettings, window: int = 1000):
+        self.name = name
+        self.settings = settings
+        self.requests = TokenBucket(settings.requests_per_minute)
+        self.tokens = TokenBucket(settings.tokens_per_minute)
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.rejected = 0
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._waits: deque[float] = deque(maxlen=window)
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def admit(
+        self, priority: Priority, tokens: int, deadline: float | None = None
+    ) -> Ticket:
+        """Wait for admission of a call expected to use ``tokens`` tokens.
+
+        ``deadline`` is a ``time.monotonic()`` timestamp.
+        """
+        now = time.monotonic()
+        if len(self._queue) >= self.settings.max_queue:
+            worst = max(self._queue, default=None)
+            if worst is None or priority >= worst.priority:
+                self.rejected += 1
+                raise QueueFullError(f"{self.name} queue is full")
+            # Make room by evicting the least important waiter.
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            self.rejected += 1
+            _settle(worst.future, exc=QueueFullError(f"{self.name} queue is full"))
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(int(priority), next(self._seq), tokens, deadline, now, future)
+        heapq.heappush(self._queue, waiter)
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if not future.done() or future.cancelled():
+                # Still queued: don't let it hold a queue slot or show in metrics.
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+            elif future.exception() is None:
+                # Admitted just as the caller gave up.
+                self.release(future.result())
+            raise
+
+    def release(self, ticket: Ticket) -> None:
+        """Return the in-flight slot held by ``ticket``."""
+        self.in_flight -= 1
+        self._wakeup.set()
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority, tokens: int, deadline: float | None = None
+    ):
+        """``async with`` form of ``admit`` that always releases the slot."""
+        ticket = await self.admit(priority, tokens, deadline)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def metrics(self) -> dict:
+        """Queue depth, wait-time percentiles and counters."""
+        waits = sorted(self._waits)
+        depth = {p.name.lower(): 0 for p in Priority}
+        for waiter in self._queue:
+            depth[Priority(waiter.priority).name.lower()] += 1
+        return {
+            "queue_depth": depth,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "rejected": self.rejected,
+            "queue_wait_seconds": {
+                "p50": _percentile(waits, 0.50),
+                "p95": _percentile(waits, 0.95),
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            self._shed_expired(now)
+            if not self._queue or self.in_flight >= self.settings.max_in_flight:
+                await self._wakeup.wait()
+                continue
+
+            head = self._queue[0]
+            wait = max(
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(head.tokens, now),
+            )
+            if head.deadline is not None and now + wait > head.deadline:
+                heapq.heappop(self._queue)
+                self._shed(head)
+                continue
+            if wait > 0:
+                # A more urgent request may arrive while we wait for the buckets.
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(head.tokens)
+            self.in_flight += 1
+            self.admitted += 1
+            waited = now - head.enqueued
+            self._waits.append(waited)
+            _settle(head.future, result=Ticket(self, head.tokens, waited))
+
+    def _shed_expired(self, now: float) -> None:
+        expired = [
+            w
+            for w in self._queue
+            if w.future.done() or (w.deadline is not None and w.deadline <= now)
+        ]
+        if not expired:
+            return
+        self._queue = [w for w in self._queue if w not in expired]
+        heapq.heapify(self._queue)
+        for waiter in expired:
+            if not waiter.future.done():
+                self._shed(waiter)
+
+    def _shed(self, waiter: _Waiter) -> None:
+        self.shed += 1
+        _settle(
+            waiter.future,
+            exc=DeadlineExceededError(f"{self.name} could not admit request in time"),
+        )
+
+
+def _settle(future: asyncio.Future, result=None, exc: BaseException | None = None) -> None:
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def estimate_tokens(text: str, max_output_tokens: int | None = None) -> int:
+    """Rough token estimate used before the provider reports real usage."""
+    return len(text) // 4 + (max_output_tokens or 1024)
@@ -0,0 +1,178 @@
+"""Multiplexed, cancellable generations over one WebSocket.
+
+Client -> server messages:
+- plain text: start a generation with a server-assigned ``request_id``
+  (``srv-1``, ``srv-2``, ...; the ``srv-`` prefix is reserved for these)
+- ``{"message": "...", "request_id": "..."}``: start a generation
+- ``{"type": "cancel", "request_id": "..."}``: abort a running generation
+
+Every server -> client frame carries the ``request_id`` it belongs to, so the
+streams of concurrent generations can be interleaved on one socket.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from streaming import (
+    FrameSender,
+    SlowConsumerError,
+    StreamSettings,
+    stream_tokens,
+)
+
+logger = logging.getLogger(__name__)
+
+# Prefix of server-assigned request ids; client ids may not use it.
+SERVER_ID_PREFIX = "srv-"
+
+# Produces the token stream for one user message.
+Generate = Callable[[str], AsyncIterator[str]]
+
+
+class ChatSession:
+    """Serves one WebSocket connection."""
+
+    def __init__(
+        self,
+        websocket: Any,
+        generate: Generate,
+        settings: StreamSettings,
+        max_concurrent: int = 4,
+    ):
+        self.websocket = websocket
+        self.generate = generate
+        self.settings = settings
+        self.max_concurrent = max_concurrent
+        self.sender = FrameSender.from_settings(websocket, settings)
+        self.generations: dict[str, asyncio.Task] = {}
+        self._ids = itertools.count(1)
+        self._failure: asyncio.Future | None = None
+
+    async def serve(self) -> None:
+        """Read client messages until the socket closes.
+
+        Whatever way this returns or raises, every generation task and the
+        sender task have finished by the time it does.
+        """
+        self._failure = asyncio.get_running_loop().create_future()
+        send_task = asyncio.create_task(self.sender.run())
+        send_task.add_done_callback(self._on_sender_done)
+        try:
+            while True:
+                receive = asyncio.ensure_future(self.websocket.receive_text())
+                await asyncio.wait(
+                    {receive, self._failure}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if self._failure.done():
+                    receive.cancel()
+                    await asyncio.gather(receive, return_exceptions=True)
+                    self._failure.result()
+                await self.handle(receive.result())
+        finally:
+            await self.close()
+            send_task.cancel()
+            await asyncio.gather(send_task, return_exceptions=True)
+            if self._failure.done():
+                # Mark a failure that raced with shutdown as retrieved.
+                self._failure.exception()
+
+    async def handle(self, data: str) -> None:
+        """Dispatch one client message."""
+        logger.info(f"Received WebSocket data: {repr(data)}")
+        try:
+            parsed_data = json.loads(data)
+        except json.JSONDecodeError:
+            parsed_data = None
+        if not isinstance(parsed_data, dict):
+            parsed_data = {"message": data}
+
+        request_id = str(parsed_data.get("request_id") or "")
+        if parsed_data.get("type") == "cancel":
+            if not request_id:
+                await self._send("", "error", "No request id provided")
+                return
+            await self.cancel(request_id)
+            return
+        if not request_id:
+            request_id = f"{SERVER_ID_PREFIX}{next(self._ids)}"
+        elif request_id.startswith(SERVER_ID_PREFIX):
+            await self._send(request_id, "error", "Request id prefix is reserved")
+            return
+
+        user_message = parsed_data.get("message", "")
+        if not user_message:
+            await self._send(request_id, "error", "No message provided")
+            return
+        if request_id in self.generations:
+            await self._send(request_id, "error", "Request id already in use")
+            return
+        if len(self.generations) >= self.max_concurrent:
+            await self._send(request_id, "error", "Too many concurrent requests")
+            return
+
+        task = asyncio.create_task(self._run(request_id, user_message))
+        self.generations[request_id] = task
+        task.add_done_callback(lambda t: self._forget(request_id, t))
+
+    async def cancel(self, request_id: str) -> None:
+        """Abort a running generation at the client's request."""
+        task = self.generations.get(request_id)
+        if task is None:
+            await self._send(request_id, "error", "Unknown request id")
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await self._send(request_id, "cancelled")
+
+    async def close(self) -> None:
+        """Cancel every running generation and wait for them to unwind."""
+        tasks = list(self.generations.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.sender.close()
+
+    async def _run(self, request_id: str, user_message: str) -> None:
+        try:
+            await self._send(request_id, "start")
+            stats = await stream_tokens(
+                self.sender,
+                self.generate(user_message),
+                self.settings,
+                request_id=request_id,
+            )
+            logger.info(
+                f"[{request_id}] Streamed {stats.tokens} tokens in {stats.frames} frames "
+                f"({stats.merged_frames} merged, {stats.blocked_seconds:.3f}s blocked)"
+            )
+            await self._send(request_id, "end")
+        except SlowConsumerError as e:
+            self._fail(e)
+        except Exception as e:
+            logger.error(f"[{request_id}] Error in generation: {str(e)}", exc_info=True)
+            try:
+                await self._send(request_id, "error", f"Error: {str(e)}")
+            except Exception as send_error:
+                self._fail(send_error)
+
+    async def _send(self, request_id: str, message_type: str, message: str = "") -> None:
+        frame = {"sender": "bot", "message_type": message_type, "request_id": request_id}
+        if message:
+            frame["message"] = message
+        await self.sender.put(frame)
+
+    def _forget(self, request_id: str, task: asyncio.Task) -> None:
+        if self.generations.get(request_id) is task:
+            del self.generations[request_id]
+
+    def _fail(self, e: BaseException) -> None:
+        if self._failure is not None and not self._failure.done():
+            self._failure.set_exception(e)
+
+    def _on_sender_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self._fail(task.exception())
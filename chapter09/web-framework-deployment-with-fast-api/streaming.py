@@ -0,0 +1,280 @@
+"""Token coalescing and backpressure for WebSocket streaming.
+
+Sending one frame per token means one JSON serialization and one network frame
+per token. The helpers here batch tokens into frames, flushing either when a
+frame grows past ``max_frame_chars`` or ``flush_interval`` seconds after its
+first token arrived, and push the frames through a bounded per-connection send
+buffer with a configurable slow-consumer policy.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+_EOS = object()
+
+
+class SlowConsumerPolicy(str, Enum):
+    """What to do when the send buffer of a connection is full."""
+
+    # Wait for the client to drain the buffer, pausing the token reader.
+    BLOCK = "block"
+    # Fold new text into the newest pending frame, keeping the frame count bounded.
+    MERGE = "merge"
+    # Give up on the client and drop the connection.
+    CLOSE = "close"
+
+
+class SlowConsumerError(Exception):
+    """Raised when a client cannot keep up and the policy is ``close``."""
+
+
+@dataclass
+class StreamSettings:
+    """Knobs for streaming a response over a WebSocket."""
+
+    # Flush a frame once it holds at least this many characters.
+    max_frame_chars: int = 256
+    # Flush a frame at most this many seconds after its first token.
+    flush_interval: float = 0.005
+    # Frames waiting to be written to one connection.
+    max_pending_frames: int = 64
+    # Tokens read ahead of the frame being built; once as many wait, the
+    # source isn't read any further.
+    max_buffered_tokens: int = 256
+    slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.BLOCK
+
+    @classmethod
+    def from_env(cls) -> "StreamSettings":
+        """Read settings from ``STREAM_*`` environment variables."""
+        return cls(
+            max_frame_chars=int(os.getenv("STREAM_MAX_FRAME_CHARS", cls.max_frame_chars)),
+            flush_interval=float(os.getenv("STREAM_FLUSH_INTERVAL", cls.flush_interval)),
+            max_pending_frames=int(
+                os.getenv("STREAM_MAX_PENDING_FRAMES", cls.max_pending_frames)
+            ),
+            max_buffered_tokens=int(
+                os.getenv("STREAM_MAX_BUFFERED_TOKENS", cls.max_buffered_tokens)
+            ),
+            slow_consumer_policy=SlowConsumerPolicy(
+                os.getenv("STREAM_SLOW_CONSUMER_POLICY", cls.slow_consumer_policy.value)
+            ),
+        )
+
+
+@dataclass
+class StreamStats:
+    """Counters for one streamed response."""
+
+    tokens: int = 0
+    frames: int = 0
+    chars: int = 0
+    merged_frames: int = 0
+    blocked_seconds: float = 0.0
+
+
+async def _pump(tokens: AsyncIterator[str], queue: asyncio.Queue) -> None:
+    try:
+        async for token in tokens:
+            # Waits while the queue is full, so a slow reader slows the source.
+            await queue.put(token)
+    except asyncio.CancelledError:
+        # The reader is gone; nobody waits for the end marker.
+        raise
+    except Exception:
+        await queue.put(_EOS)
+        raise
+    await queue.put(_EOS)
+
+
+async def coalesce(
+    tokens: AsyncIterator[str],
+    max_frame_chars: int,
+    flush_interval: float,
+    stats: StreamStats | None = None,
+    max_buffered_tokens: int = 0,
+) -> AsyncIterator[str]:
+    """Group ``tokens`` into chunks bounded by size and age.
+
+    The source iterator is drained by a helper task so that waiting for the
+    flush deadline never cancels the source itself. The task reads at most
+    ``max_buffered_tokens`` ahead (0: no limit), so when the chunks aren't
+    consumed the source isn't read either.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered_tokens)
+    pump = asyncio.create_task(_pump(tokens, queue))
+    buffer: list[str] = []
+    size = 0
+    deadline = None
+    try:
+        while True:
+            try:
+                token = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    token = await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    size = 0
+                    deadline = None
+                    continue
+
+            if token is _EOS:
+                break
+
+            if stats is not None:
+                stats.tokens += 1
+            buffer.append(token)
+            size += len(token)
+            if deadline is None:
+                deadline = loop.time() + flush_interval
+            if size >= max_frame_chars:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+                deadline = None
+
+        if buffer:
+            yield "".join(buffer)
+        # Surface errors raised by the source iterator.
+        await pump
+    finally:
+        pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
+
+
+class FrameSender:
+    """Bounded send buffer draining frames to a single WebSocket.
+
+    One sender is shared by every response streamed over a connection, so
+    frames are written by a single task and never interleave mid-write.
+    """
+
+    def __init__(
+        self,
+        websocket: Any,
+        max_pending_frames: int,
+        policy: SlowConsumerPolicy,
+    ):
+        self.websocket = websocket
+        self.max_pending_frames = max_pending_frames
+        self.policy = policy
+        self.frames_sent = 0
+        self._frames: deque[dict] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+        self._error: BaseException | None = None
+
+    @classmethod
+    def from_settings(cls, websocket: Any, settings: StreamSettings) -> "FrameSender":
+        return cls(websocket, settings.max_pending_frames, settings.slow_consumer_policy)
+
+    async def put(self, frame: dict, stats: StreamStats | None = None) -> None:
+        """Queue a frame, applying the slow-consumer policy when full."""
+        self._raise_if_closed()
+        if len(self._frames) >= self.max_pending_frames:
+            if self.policy is SlowConsumerPolicy.CLOSE:
+                raise SlowConsumerError(
+                    f"client fell {len(self._frames)} frames behind"
+                )
+            if self.policy is SlowConsumerPolicy.MERGE and _can_merge(
+                self._frames[-1], frame
+            ):
+                self._frames[-1]["message"] += frame["message"]
+                if stats is not None:
+                    stats.merged_frames += 1
+                return
+            started = time.perf_counter()
+            while len(self._frames) >= self.max_pending_frames and not self._closed:
+                self._not_full.clear()
+                await self._not_full.wait()
+            if stats is not None:
+                stats.blocked_seconds += time.perf_counter() - started
+            self._raise_if_closed()
+
+        self._frames.append(frame)
+        self._not_empty.set()
+        if stats is not None:
+            stats.frames += 1
+            stats.chars += len(frame.get("message", ""))
+
+    def _raise_if_closed(self) -> None:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise RuntimeError("FrameSender is closed")
+
+    async def close(self) -> None:
+        """Stop accepting frames; ``run`` returns once the buffer is drained."""
+        self._closed = True
+        self._not_empty.set()
+
+    async def run(self) -> None:
+        """Write queued frames to the WebSocket until closed and drained."""
+        try:
+            while True:
+                if not self._frames:
+                    if self._closed:
+                        return
+                    self._not_empty.clear()
+                    await self._not_empty.wait()
+                    continue
+
+                frame = self._frames.popleft()
+                self._not_full.set()
+                await self.websocket.send_json(frame)
+                self.frames_sent += 1
+        except BaseException as e:
+            self._error = e
+            raise
+        finally:
+            # Never leave a blocked producer waiting on a dead socket.
+            self._closed = True
+            self._not_full.set()
+
+
+def _can_merge(pending: dict, frame: dict) -> bool:
+    return (
+        pending.get("message_type") == "stream"
+        and frame.get("message_type") == "stream"
+        and pending.get("request_id") == frame.get("request_id")
+    )
+
+
+async def stream_tokens(
+    sender: FrameSender,
+    tokens: AsyncIterator[str],
+    settings: StreamSettings,
+    **extra: Any,
+) -> StreamStats:
+    """Stream ``tokens`` through ``sender`` as coalesced ``stream`` frames.
+
+    Any ``extra`` keys, such as ``request_id``, are added to every frame.
+    """
+    stats = StreamStats()
+    chunks = coalesce(
+        tokens,
+        settings.max_frame_chars,
+        settings.flush_interval,
+        stats,
+        settings.max_buffered_tokens,
+    )
+    # aclosing() stops the token source right away if we are cancelled.
+    async with aclosing(chunks):
+        async for text in chunks:
+            await sender.put(
+                {"sender": "bot", "message_type": "stream", "message": text, **extra},
+                stats,
+            )
+    return stats
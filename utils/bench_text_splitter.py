@@ -0,0 +1,120 @@
+"""RecursiveTextSplitter vs langchain's RecursiveCharacterTextSplitter.
+
+Checks that both produce the same chunks (and ``start_index``) on every text
+file in the repository plus generated edge cases, for the chatbot's 1500/200,
+the Ray index builder's 500/50, a token-count length function and random
+sizes, then reports MB/s of ``split_documents`` for each.
+
+Run:
+> uv run bench_text_splitter.py --copies 20
+"""
+
+import argparse
+import pathlib
+import random
+import re
+import time
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils import RecursiveTextSplitter
+
+REPO = pathlib.Path(__file__).resolve().parents[1]
+SUFFIXES = {".md", ".py", ".json", ".toml", ".html", ".txt"}
+
+
+def words(text: str) -> int:
+    """Stand-in token count: words and punctuation marks."""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def corpus() -> tuple[list[Document], list[Document]]:
+    """Repository text files, and generated edge cases."""
+    files = [
+        Document(path.read_text(encoding="utf-8"), metadata={"source": str(path)})
+        for path in sorted(REPO.rglob("*"))
+        if path.suffix in SUFFIXES
+        and path.is_file()
+        and ".venv" not in path.parts
+        and path.stat().st_size < 2_000_000
+    ]
+    rng = random.Random(0)
+    alphabet = ["a", "b", " ", "\n", "\n\n", "  ", "\t", "　", "长", "x" * 700]
+    generated = [
+        Document("".join(rng.choices(alphabet, k=rng.randint(0, 300))), metadata={})
+        for _ in range(100)
+    ]
+    generated += [
+        Document(text, metadata={})
+        for text in ("", " \n ", "a" * 5000, "\n\n" * 1000, "word " * 2000)
+    ]
+    return files, generated
+
+
+def check(docs: list[Document], **kwargs) -> None:
+    ours = RecursiveTextSplitter(add_start_index=True, **kwargs)
+    theirs = RecursiveCharacterTextSplitter(add_start_index=True, **kwargs)
+    start_mismatches = 0
+    for doc in docs:
+        expected = theirs.split_documents([doc])
+        got = ours.split_documents([doc])
+        assert [d.page_content for d in got] == [d.page_content for d in expected], (
+            f"chunks differ for {doc.metadata.get('source', doc.page_content[:40])!r}"
+            f" with {kwargs}"
+        )
+        for a, b in zip(got, expected):
+            # langchain finds start_index with str.find, which can land on an
+            # earlier copy of a repeated chunk; ours is the real offset.
+            start = a.metadata["start_index"]
+            assert doc.page_content.startswith(a.page_content, start)
+            start_mismatches += a.metadata["start_index"] != b.metadata["start_index"]
+    print(f"equivalent: {kwargs} ({start_mismatches} start_index differ)")
+
+
+def throughput(splitter, docs: list[Document], repeat: int) -> float:
+    size = sum(len(d.page_content.encode()) for d in docs)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        splitter.split_documents(docs)
+        best = min(best, time.perf_counter() - started)
+    return size / best / 1e6
+
+
+SETTINGS = {
+    "1500/200 chars": {"chunk_size": 1500, "chunk_overlap": 200},
+    "500/50 chars": {"chunk_size": 500, "chunk_overlap": 50},
+    "300/30 words": {"chunk_size": 300, "chunk_overlap": 30, "length_function": words},
+}
+
+
+def main(args: argparse.Namespace) -> None:
+    files, generated = corpus()
+    for kwargs in SETTINGS.values():
+        check(files + generated, **kwargs)
+    rng = random.Random(1)
+    for _ in range(args.fuzz):
+        size = rng.randint(1, 800)
+        check(generated, chunk_size=size, chunk_overlap=rng.randint(0, size))
+
+    for corpus_name, docs in (("repository files", files), ("generated", generated)):
+        docs = docs * args.copies
+        size_mb = sum(len(d.page_content.encode()) for d in docs) / 1e6
+        print(f"\n{corpus_name}: {len(docs)} documents, {size_mb:.1f} MB")
+        for name, kwargs in SETTINGS.items():
+            theirs = RecursiveCharacterTextSplitter(add_start_index=True, **kwargs)
+            ours = RecursiveTextSplitter(add_start_index=True, **kwargs)
+            base = throughput(theirs, docs, args.repeat)
+            fast = throughput(ours, docs, args.repeat)
+            print(
+                f"{name:<15} langchain {base:6.1f} MB/s  utils {fast:6.1f} MB/s  "
+                f"x{fast / base:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=5, help="corpus repeats to time")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fuzz", type=int, default=20, help="random sizes to check")
+    main(parser.parse_args())
@@ -0,0 +1,150 @@
+"""Overhead of TracingCallbackHandler per span.
+
+Runs a four-node pipeline shaped like the chapter04 RAG graph (a retriever,
+then three nodes calling a fake streaming chat model) with no callbacks, with
+a handler that does nothing, and with the tracing handler attached through
+the run config. The no-op handler separates what langchain spends
+dispatching callbacks at all from what recording spans adds. Also times the
+handler's callbacks in isolation and the background flush.
+
+Run:
+> uv run bench_tracing.py --runs 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from langchain_core.callbacks import (
+    BaseCallbackHandler,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+from utils.tracing import TracingCallbackHandler
+
+NODES = ("retrieve", "generate", "double_check", "doc_finalizer")
+
+
+class NoopHandler(BaseCallbackHandler):
+    run_inline = True
+
+
+class FakeRetriever(BaseRetriever):
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return [Document(query)] * 4
+
+
+def pipeline(tokens: int):
+    answer = " ".join(["token"] * tokens)
+    model = GenericFakeChatModel(messages=iter(lambda: answer, None))
+    retriever = FakeRetriever()
+
+    # Sync, since the fake model's async stream hops through an executor
+    # thread, whose scheduling noise is larger than what's measured here.
+    def retrieve(question: str) -> str:
+        docs = retriever.invoke(question)
+        return docs[0].page_content
+
+    def call_model(question: str) -> str:
+        return "".join(chunk.content for chunk in model.stream(question))
+
+    steps = [retrieve, call_model, call_model, call_model]
+    chain = None
+    for name, step in zip(NODES, steps):
+        # The metadata LangGraph puts on its node runs.
+        node = RunnableLambda(step).with_config(
+            run_name=name, metadata={"langgraph_node": name}
+        )
+        chain = node if chain is None else chain | node
+    return chain.with_config(run_name="LangGraph")
+
+
+def run(chain, runs: int, config: dict) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        chain.invoke("question", config)
+    return time.perf_counter() - started
+
+
+def callbacks_only(handler: TracingCallbackHandler, spans: int) -> float:
+    """Seconds per node span spent in the handler itself."""
+    parent = uuid.uuid4()
+    handler.on_chain_start({}, {}, run_id=parent, name="LangGraph")
+    metadata = {"langgraph_node": "generate"}
+    started = time.perf_counter()
+    for _ in range(spans):
+        run_id = uuid.uuid4()
+        handler.on_chain_start(
+            {}, {}, run_id=run_id, parent_run_id=parent, name="generate",
+            metadata=metadata,
+        )
+        handler.on_chain_end({}, run_id=run_id, parent_run_id=parent)
+    seconds = time.perf_counter() - started
+    handler.on_chain_end({}, run_id=parent)
+    # uuid4() is paid by langchain either way.
+    started = time.perf_counter()
+    for _ in range(spans):
+        uuid.uuid4()
+    return (seconds - (time.perf_counter() - started)) / spans
+
+
+def main(args: argparse.Namespace) -> None:
+    chain = pipeline(args.tokens)
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "trace.jsonl")
+        handler = TracingCallbackHandler(path, format=args.format)
+        configs = {
+            "untraced": {},
+            "no-op": {"callbacks": [NoopHandler()]},
+            "traced": {"callbacks": [handler]},
+        }
+        for config in configs.values():
+            run(chain, 20, config)
+        handler.flush()
+        recorded = handler.recorded
+
+        best = dict.fromkeys(configs, float("inf"))
+        for _ in range(args.repeat):
+            for name, config in configs.items():
+                best[name] = min(best[name], run(chain, args.runs, config))
+        spans = (handler.recorded - recorded) // args.repeat
+
+        started = time.perf_counter()
+        flushed = handler.flush()
+        flush_seconds = time.perf_counter() - started
+        size = os.path.getsize(path)
+        per_callback = callbacks_only(handler, args.runs * 10)
+        handler.close()
+
+    print(
+        f"{args.runs} runs, {spans // args.runs} spans per run, "
+        f"{args.tokens} tokens per LLM call"
+    )
+    for name, seconds in best.items():
+        print(f"{name:<9} {seconds / args.runs * 1e6:8.1f} us/run")
+    dispatch = (best["no-op"] - best["untraced"]) / spans
+    tracing = (best["traced"] - best["no-op"]) / spans
+    print(f"dispatch  {dispatch * 1e6:8.2f} us/span langchain spends on any handler")
+    print(f"tracing   {tracing * 1e6:8.2f} us/span on top of that")
+    print(f"handler   {per_callback * 1e6:8.2f} us/span in the callbacks alone")
+    print(
+        f"flush     {flushed / flush_seconds:8.0f} spans/s on the flusher thread, "
+        f"{size / handler.flushed:.0f} bytes/span ({args.format})"
+    )
+    print(f"metrics   {handler.metrics()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=20, help="tokens per LLM call")
+    parser.add_argument("--format", choices=["jsonl", "otlp"], default="jsonl")
+    main(parser.parse_args())
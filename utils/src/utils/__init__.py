@@ -1 +1,4 @@
 from .config import Config
+from .router import Backend, NoHealthyBackendError, Router
+from .text_splitter import RecursiveTextSplitter
+from .tracing import TracingCallbackHandler
@@ -4,6 +4,8 @@ import dotenv
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 
+from .router import Backend, Router
+
 
 class Config:
     def __init__(self):
@@ -66,3 +68,11 @@ class Config:
         return ChatOpenAI(
             api_key=self.api_key, base_url=self.base_url, model=self.vl_model, **kwargs
         )
+
+    def new_router(self, hedge: bool = False, **kwargs) -> Router:
+        # 在已配置的 Anthropic 与 OpenAI 兼容服务之间按延迟路由，参见 router.py
+        backends = []
+        if self.anthropic_model:
+            backends.append(Backend("anthropic", self.new_anthropic(**kwargs)))
+        backends.append(Backend("openai", self.new_openai_like(**kwargs)))
+        return Router(backends, hedge=hedge)
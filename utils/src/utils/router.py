@@ -0,0 +1,237 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+
+class NoHealthyBackendError(RuntimeError):
+    pass
+
+
+# Runs a backend call given the backend's name, e.g. once a per-provider
+# scheduler admits it; see ``Router.ainvoke``.
+Admission = Callable[[str, Callable[[], Awaitable[BaseMessage]]], Awaitable[BaseMessage]]
+
+
+@dataclass
+class BackendStats:
+    """Rolling latency and error rate of one backend."""
+
+    window: int = 100
+    latencies: deque = field(default_factory=deque)
+    outcomes: deque = field(default_factory=deque)
+    unhealthy_until: float = 0.0
+
+    def record(self, latency: float | None, ok: bool) -> None:
+        if latency is not None:
+            self.latencies.append(latency)
+            if len(self.latencies) > self.window:
+                self.latencies.popleft()
+        self.outcomes.append(ok)
+        if len(self.outcomes) > self.window:
+            self.outcomes.popleft()
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+@dataclass
+class Backend:
+    name: str
+    model: BaseChatModel
+    stats: BackendStats = field(default_factory=BackendStats)
+
+
+class Router:
+    """Sends each chat request to the fastest healthy backend.
+
+    Backends are ranked by their rolling median latency; a backend with fewer
+    than ``min_samples`` results ranks first so every backend gets measured.
+    With ``hedge`` enabled, a second request goes to the runner-up once the
+    primary has been slower than its own p95, and whichever answers first
+    wins while the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        default_hedge_delay: float = 2.0,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        cooldown: float = 30.0,
+    ):
+        if not backends:
+            raise ValueError("Router needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def rank(self) -> list[Backend]:
+        """Healthy backends, fastest first."""
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.stats.unhealthy_until <= now]
+
+        def score(backend: Backend) -> float:
+            if len(backend.stats.latencies) < self.min_samples:
+                return -1.0
+            return backend.stats.percentile(0.5)
+
+        return sorted(healthy, key=score)
+
+    def hedge_delay(self, backend: Backend) -> float:
+        if len(backend.stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return backend.stats.percentile(self.hedge_quantile)
+
+    async def ainvoke(
+        self, input, config=None, *, admission: Admission | None = None, **kwargs
+    ) -> BaseMessage:
+        """Call the fastest healthy backend, hedging and failing over.
+
+        ``admission``, when given, runs every backend call, including hedges
+        and failovers, so rate limits can be applied per backend. A backend
+        that refuses a call there is failed over but isn't marked unhealthy.
+        """
+        ranked = self.rank()
+        if not ranked:
+            raise NoHealthyBackendError("all backends are cooling down")
+        self.requests += 1
+
+        tasks: dict[asyncio.Task, Backend] = {}
+
+        def launch(backend: Backend) -> None:
+            task = asyncio.create_task(
+                self._acall(backend, input, config, admission, **kwargs)
+            )
+            tasks[task] = backend
+
+        primary, remaining = ranked[0], ranked[1:]
+        launch(primary)
+        hedge_at = self.hedge_delay(primary) if self.hedge and remaining else None
+        hedged = False
+        errors = []
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=hedge_at, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The primary is slower than usual: hedge on the runner-up.
+                    hedge_at = None
+                    hedged = True
+                    self.hedges += 1
+                    launch(remaining.pop(0))
+                    continue
+
+                for task in done:
+                    backend = tasks.pop(task)
+                    if task.exception() is None:
+                        if hedged and backend is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    errors.append(task.exception())
+
+                # Fail over once nothing else is in flight.
+                hedge_at = None
+                if not tasks and remaining:
+                    launch(remaining.pop(0))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        raise errors[-1]
+
+    def invoke(self, input, config=None, **kwargs) -> BaseMessage:
+        """Blocking variant; fails over in rank order but never hedges."""
+        ranked = self.rank()
+        if not ranked:
+            raise NoHealthyBackendError("all backends are cooling down")
+        self.requests += 1
+
+        error = None
+        for backend in ranked:
+            started = time.perf_counter()
+            try:
+                result = backend.model.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._record(backend, None, False)
+                error = e
+                continue
+            self._record(backend, time.perf_counter() - started, True)
+            return result
+        raise error
+
+    async def _acall(
+        self, backend: Backend, input, config, admission: Admission | None, **kwargs
+    ) -> BaseMessage:
+        started = None
+
+        async def call() -> BaseMessage:
+            nonlocal started
+            # Time spent waiting for admission isn't the backend's latency.
+            started = time.perf_counter()
+            return await backend.model.ainvoke(input, config, **kwargs)
+
+        try:
+            if admission is None:
+                result = await call()
+            else:
+                result = await admission(backend.name, call)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser says nothing about its latency.
+            raise
+        except Exception:
+            if started is not None:
+                self._record(backend, None, False)
+            raise
+        self._record(backend, time.perf_counter() - started, True)
+        return result
+
+    def _record(self, backend: Backend, latency: float | None, ok: bool) -> None:
+        stats = backend.stats
+        stats.record(latency, ok)
+        if (
+            len(stats.outcomes) >= self.min_samples
+            and stats.error_rate > self.max_error_rate
+        ):
+            stats.unhealthy_until = time.monotonic() + self.cooldown
+            # Start over once the cooldown ends.
+            stats.outcomes.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "backends": {
+                b.name: {
+                    "p50": b.stats.percentile(0.5),
+                    "p95": b.stats.percentile(0.95),
+                    "error_rate": b.stats.error_rate,
+                    "healthy": b.stats.unhealthy_until <= time.monotonic(),
+                }
+                for b in self.backends
+            },
+        }
@@ -0,0 +1,180 @@
+import logging
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+
+from langchain_core.documents import Document
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class RecursiveTextSplitter:
+    """Drop-in for langchain's ``RecursiveCharacterTextSplitter`` defaults.
+
+    Produces the same chunks as ``RecursiveCharacterTextSplitter`` with its
+    default ``keep_separator=True`` and literal separators, but works on
+    ``(start, end)`` offsets into the original string: pieces are never
+    copied, and only the final chunks are sliced out. ``start_index`` is
+    therefore the exact offset of each chunk rather than a ``str.find``
+    guess.
+
+    Lengths are measured in characters by default. Pass ``length_function``
+    (e.g. a tokenizer's token count) to size chunks in tokens instead; pieces
+    are then sliced once each to be measured.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: Iterable[str] = DEFAULT_SEPARATORS,
+        length_function: Callable[[str], int] | None = None,
+        add_start_index: bool = False,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if not 0 <= chunk_overlap <= chunk_size:
+            raise ValueError(
+                f"chunk_overlap must be between 0 and chunk_size, got {chunk_overlap}"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self.length_function = length_function
+        self.add_start_index = add_start_index
+
+    def split_text(self, text: str) -> list[str]:
+        return [text[start:end] for start, end in self.spans(text)]
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        return list(self.split_iter(docs))
+
+    def split_iter(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """Chunks of ``docs``, produced lazily one document at a time."""
+        for doc in docs:
+            text = doc.page_content
+            for start, end in self.spans(text):
+                metadata = dict(doc.metadata)
+                if self.add_start_index:
+                    metadata["start_index"] = start
+                yield Document(page_content=text[start:end], metadata=metadata)
+
+    def spans(self, text: str) -> Iterator[tuple[int, int]]:
+        """``(start, end)`` of each chunk of ``text``, in order."""
+        return self._split(text, 0, len(text), self.separators)
+
+    def _length(self, text: str, start: int, end: int) -> int:
+        if self.length_function is None:
+            return end - start
+        return self.length_function(text[start:end])
+
+    def _split(
+        self, text: str, start: int, end: int, separators: tuple[str, ...]
+    ) -> Iterator[tuple[int, int]]:
+        # The first separator present in text[start:end]; "" splits characters.
+        separator, finer = separators[-1], ()
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator, finer = candidate, separators[i + 1 :]
+                break
+        if not separator and self.length_function is None and self.chunk_size > 1:
+            yield from self._merge_characters(text, start, end)
+            return
+
+        good: list[tuple[int, int, int]] = []
+        for piece_start, piece_end in _pieces(text, start, end, separator):
+            size = self._length(text, piece_start, piece_end)
+            if size < self.chunk_size:
+                good.append((piece_start, piece_end, size))
+                continue
+            if good:
+                yield from self._merge(text, good)
+                good = []
+            if finer:
+                yield from self._split(text, piece_start, piece_end, finer)
+            else:
+                yield piece_start, piece_end
+        if good:
+            yield from self._merge(text, good)
+
+    def _merge(
+        self, text: str, pieces: list[tuple[int, int, int]]
+    ) -> Iterator[tuple[int, int]]:
+        """Combine contiguous pieces into chunks of up to ``chunk_size``.
+
+        Each chunk starts with up to ``chunk_overlap`` of the previous one.
+        """
+        window: deque[tuple[int, int, int]] = deque()
+        total = 0
+        for piece in pieces:
+            size = piece[2]
+            if total + size > self.chunk_size:
+                if total > self.chunk_size:
+                    LOGGER.warning(
+                        f"Created a chunk of size {total}, which is longer than "
+                        f"the specified {self.chunk_size}"
+                    )
+                if window:
+                    span = _strip(text, window[0][0], window[-1][1])
+                    if span:
+                        yield span
+                    while total > self.chunk_overlap or (
+                        total + size > self.chunk_size and total > 0
+                    ):
+                        total -= window.popleft()[2]
+            window.append(piece)
+            total += size
+        if window:
+            span = _strip(text, window[0][0], window[-1][1])
+            if span:
+                yield span
+
+    def _merge_characters(
+        self, text: str, start: int, end: int
+    ) -> Iterator[tuple[int, int]]:
+        """``_merge`` of single-character pieces, without building them.
+
+        Every window is ``chunk_size`` characters and the next one starts
+        with the last ``chunk_overlap`` of them (at most ``chunk_size - 1``).
+        """
+        keep = min(self.chunk_overlap, self.chunk_size - 1)
+        while True:
+            stop = min(start + self.chunk_size, end)
+            span = _strip(text, start, stop)
+            if span:
+                yield span
+            if stop == end:
+                return
+            start = stop - keep
+
+
+def _pieces(
+    text: str, start: int, end: int, separator: str
+) -> Iterator[tuple[int, int]]:
+    """Split text[start:end] before each separator, keeping it on the next piece."""
+    if not separator:
+        for i in range(start, end):
+            yield i, i + 1
+        return
+    width = len(separator)
+    position = text.find(separator, start, end)
+    while position != -1:
+        if position > start:
+            yield start, position
+        start = position
+        position = text.find(separator, position + width, end)
+    if end > start:
+        yield start, end
+
+
+def _strip(text: str, start: int, end: int) -> tuple[int, int] | None:
+    """``text[start:end].strip()`` as offsets, None when only whitespace is left."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
@@ -0,0 +1,392 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# OTLP span kinds
+_INTERNAL = 1
+_CLIENT = 3
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records spans for graph runs, graph nodes, LLM calls and retrievers.
+
+    Callbacks only append a tuple to a bounded ``deque``, whose appends are
+    atomic, so nothing on the request path takes a lock or touches the file;
+    once the buffer is full the oldest spans are dropped. A daemon thread
+    drains it every ``flush_interval`` seconds to ``path``, one span per line
+    (``format="jsonl"``), or one OTLP/JSON ``ExportTraceServiceRequest`` per
+    flush (``format="otlp"``), which the OpenTelemetry Collector's
+    ``otlpjsonfile`` receiver can import.
+
+    LLM spans carry time to first token (when streaming) and token usage.
+    Attach it through the run config: ``{"callbacks": [handler]}``.
+    """
+
+    # Called in the caller's thread or loop rather than an executor.
+    run_inline = True
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 65536,
+        flush_interval: float = 1.0,
+        format: str = "jsonl",
+        service_name: str = "langchain",
+    ):
+        if format not in ("jsonl", "otlp"):
+            raise ValueError(f"Unknown trace format: {format}")
+        self.path = path
+        self.format = format
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self._buffer: deque[tuple] = deque(maxlen=capacity)
+        # Every run in flight: [trace id, nearest traced ancestor or itself,
+        # parent span, name, kind, start ns, attributes]; name is None for
+        # runs that aren't spans themselves.
+        self._runs: dict[UUID, list] = {}
+        # Run of the last token seen, whose first token is already recorded.
+        self._last_token_run: UUID | None = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="trace-flusher", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, prefix: str = "TRACE") -> "TracingCallbackHandler | None":
+        """Handler writing to ``{prefix}_FILE``, or None when that isn't set."""
+        path = os.getenv(f"{prefix}_FILE")
+        if not path:
+            return None
+        return cls(
+            path,
+            capacity=int(os.getenv(f"{prefix}_CAPACITY", "65536")),
+            flush_interval=float(os.getenv(f"{prefix}_FLUSH_INTERVAL", "1.0")),
+            format=os.getenv(f"{prefix}_FORMAT", "jsonl"),
+        )
+
+    # Span bookkeeping
+
+    def _start(
+        self,
+        run_id: UUID,
+        parent_run_id: UUID | None,
+        name: str | None,
+        kind: str,
+        attributes: dict | None = None,
+    ) -> None:
+        parent = self._runs.get(parent_run_id)
+        if parent is None:
+            trace_id, parent_span = parent_run_id or run_id, parent_run_id
+        else:
+            trace_id, parent_span = parent[0], parent[1]
+        if name is None:
+            # Children of this run hang off its nearest traced ancestor.
+            self._runs[run_id] = [trace_id, parent_span, None, None]
+        else:
+            self._runs[run_id] = [
+                trace_id, run_id, parent_span, name, kind, time.time_ns(), attributes
+            ]
+
+    def _end(
+        self,
+        run_id: UUID,
+        error: BaseException | None = None,
+        attributes: dict | None = None,
+    ) -> None:
+        end = time.time_ns()
+        run = self._runs.pop(run_id, None)
+        if run is None or run[3] is None:
+            return
+        trace_id, _, parent_span, name, kind, start, attrs = run
+        if attrs is None:
+            attrs = attributes
+        elif attributes:
+            attrs.update(attributes)
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(
+            (trace_id, run_id, parent_span, name, kind, start, end, error, attrs)
+        )
+        self.recorded += 1
+
+    # Chains: the graph itself and its nodes
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name")
+        if parent_run_id is None or parent_run_id not in self._runs:
+            self._start(run_id, parent_run_id, name or "chain", "chain")
+        elif metadata and name and metadata.get("langgraph_node") == name:
+            self._start(run_id, parent_run_id, name, "node")
+        else:
+            self._start(run_id, parent_run_id, None, "chain")
+
+    def on_chain_end(
+        self,
+        outputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._end(run_id)
+
+    def on_chain_error(
+        self,
+        error: BaseException,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._end(run_id, error)
+
+    # LLM calls
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._llm_start(run_id, parent_run_id, metadata, kwargs)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._llm_start(run_id, parent_run_id, metadata, kwargs)
+
+    def _llm_start(self, run_id, parent_run_id, metadata, kwargs) -> None:
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name")
+        attributes = {
+            "gen_ai.system": metadata.get("ls_provider"),
+            "gen_ai.request.model": model,
+        }
+        if "langgraph_node" in metadata:
+            attributes["langgraph.node"] = metadata["langgraph_node"]
+        name = kwargs.get("name") or (f"chat {model}" if model else "llm")
+        self._start(run_id, parent_run_id, name, "llm", attributes)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        # Called for every token: skip the dict lookup (UUID hashing is
+        # Python code) while the same stream keeps producing them.
+        if run_id is self._last_token_run:
+            return
+        self._last_token_run = run_id
+        run = self._runs.get(run_id)
+        if run is not None and run[3] is not None and "llm.ttft_ms" not in run[6]:
+            run[6]["llm.ttft_ms"] = (time.time_ns() - run[5]) / 1e6
+
+    def on_llm_end(
+        self,
+        response,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        attributes = {
+            "gen_ai.usage.input_tokens": input_tokens,
+            "gen_ai.usage.output_tokens": output_tokens,
+        }
+        self._end(run_id, attributes=attributes)
+
+    def on_llm_error(
+        self,
+        error: BaseException,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._end(run_id, error)
+
+    # Retrievers
+
+    def on_retriever_start(
+        self,
+        serialized: dict[str, Any],
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or "retriever"
+        self._start(run_id, parent_run_id, name, "retriever")
+
+    def on_retriever_end(
+        self,
+        documents,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        attributes = {"retriever.documents": len(documents)}
+        self._end(run_id, attributes=attributes)
+
+    def on_retriever_error(
+        self,
+        error: BaseException,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._end(run_id, error)
+
+    # Export
+
+    def flush(self) -> int:
+        """Write the buffered spans to ``path``; returns how many were written."""
+        spans = []
+        try:
+            while True:
+                spans.append(self._buffer.popleft())
+        except IndexError:
+            pass
+        if not spans:
+            return 0
+        if self.format == "otlp":
+            lines = [json.dumps(self._otlp(spans))]
+        else:
+            lines = [json.dumps(_flat(span)) for span in spans]
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.flushed += len(spans)
+        return len(spans)
+
+    def close(self) -> None:
+        """Stop the flusher and write what's left."""
+        if not self._closed.is_set():
+            self._closed.set()
+            self._flusher.join()
+        self.flush()
+
+    def metrics(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "buffered": len(self._buffer),
+            "open": len(self._runs),
+        }
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def _otlp(self, spans: list[tuple]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            _otlp_attribute("service.name", self.service_name)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [_otlp_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def _flat(span: tuple) -> dict:
+    trace_id, span_id, parent_id, name, kind, start, end, error, attributes = span
+    return {
+        "trace_id": trace_id.hex,
+        "span_id": span_id.hex,
+        "parent_id": parent_id.hex if parent_id else None,
+        "name": name,
+        "kind": kind,
+        "start_ns": start,
+        "duration_ms": (end - start) / 1e6,
+        "error": repr(error) if error else None,
+        "attributes": {k: v for k, v in (attributes or {}).items() if v is not None},
+    }
+
+
+def _otlp_span(span: tuple) -> dict:
+    trace_id, span_id, parent_id, name, kind, start, end, error, attributes = span
+    attributes = {"span.kind": kind, **(attributes or {})}
+    out = {
+        "traceId": trace_id.hex,
+        "spanId": _otlp_span_id(span_id),
+        "name": name,
+        "kind": _CLIENT if kind == "llm" else _INTERNAL,
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(end),
+        "attributes": [
+            _otlp_attribute(k, v) for k, v in attributes.items() if v is not None
+        ],
+        # 1: ok, 2: error
+        "status": {"code": 2, "message": repr(error)} if error else {"code": 1},
+    }
+    if parent_id:
+        out["parentSpanId"] = _otlp_span_id(parent_id)
+    return out
+
+
+def _otlp_span_id(run_id: UUID) -> str:
+    """The 8-byte OTLP span id of a run.
+
+    Uses the low half of the UUID: in the uuid7 run ids LangChain generates,
+    the high half is the timestamp, version and counter, which runs started
+    in the same millisecond share.
+    """
+    return run_id.hex[16:]
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}